@@ -1,17 +1,190 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
 from pathlib import Path
 from services.downloader import downloader
-from services.video_processing import video_processor, STYLE_MAP
+from services.video_processing import get_video_processor, STYLE_MAP, NVENC_MAX_SESSIONS
 from services.transcription import transcriber
-from services.analysis import analyzer
+from services.analysis import analyzer, backfill_moments
+from services.style_utils import build_style, hex_to_ass
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
+import logging
 import os
-import json
-import re
+import uuid
+import orjson
 
 
 router = APIRouter()
 
+# Upper bound on concurrent FFmpeg cuts per request (libx264 is already multi-threaded)
+MAX_PARALLEL_CUTS = min(4, os.cpu_count() or 1)
+
+# Minimum share of the first-start..last-end span the clips must cover to cut them in one pass
+BATCH_MIN_COVERAGE = 0.5
+
+# DEBUG LOGGING CONSTANT
+DEBUG_LOG_FILE = "debug_process_log.txt"
+ERROR_LOG_FILE = "error_log.txt"
+
+def _file_logger(name: str, filename: str) -> logging.Logger:
+    # One handler per file, opened on first write and kept open (thread-safe for the cut pool)
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.FileHandler(filename, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+    return logger
+
+_dbg = _file_logger("process_debug", DEBUG_LOG_FILE)
+_err = _file_logger("process_errors", ERROR_LOG_FILE)
+
+def log_debug(msg):
+    _dbg.debug(msg)
+
+
+@lru_cache(maxsize=32)
+def _load_segments(transcript_path: Path, mtime: float) -> list:
+    """
+    Saved transcript segments, cached per file version so repeated regenerations
+    of the same video skip the read/parse. Treat the result as read-only.
+    """
+    with open(transcript_path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def _make_master_srt(segments: list, request, final_style: str) -> str:
+    """
+    Writes one word-level caption file on the source timeline, shared by every clip.
+    It is an .ass with final_style baked in, so the cuts need no force_style.
+    Returns its path, or None if unavailable.
+    """
+    # Generate SRT if we have segments (Even if we used Heuristic analysis!)
+    # Crucial Fix: Use segments for captions even if 'moments' came from 'detect_high_energy_moments'
+    if not segments:
+        return None
+    srt_path = get_video_processor().output_dir / f"{request.file_id}_master.ass"
+    try:
+        log_debug(f"Generating SRT to {srt_path}")
+        get_video_processor().generate_word_level_srt(
+            segments, str(srt_path),
+            start_offset=0.0,
+            style_name=request.caption_style,
+            ass_style=final_style
+        )
+        log_debug(f"SRT generated. Exists? {Path(srt_path).exists()}")
+        return str(srt_path)
+    except Exception as e:
+        print(f"SRT generation failed: {e}")
+        log_debug(f"SRT generation failed: {e}")
+        return None
+
+
+def _clip_result(i: int, moment: dict, final_path: str) -> dict:
+    return {
+        "path": str(final_path),
+        "url": f"/static/{Path(final_path).name}",
+        "reason": moment.get("reason", "AI Selected"),
+        "start": moment["start"],
+        "end": moment["end"],
+        "title": moment.get("title", f"Clip {i+1}"),
+        "description": moment.get("description", ""),
+        "hashtags": moment.get("hashtags", [])
+    }
+
+
+def _cut_one(i: int, moment: dict, subtitle_arg: str, request, final_style: str, threads: int = None) -> dict:
+    """
+    Cuts/crops a single moment to a vertical clip, burning in the master SRT.
+    Runs in a worker thread; raises on failure so the caller can skip the clip.
+    """
+    output_path = get_video_processor().output_dir / f"{request.file_id}_short_{i+1}.mp4"
+
+    log_debug(f"Processing Clip {i}: {moment['start']}-{moment['end']}")
+
+    # Cut and Resize to Vertical with Captions
+    log_debug(f"Cutting video (Subtitles: {subtitle_arg})")
+    final_path = get_video_processor().cut_video(
+        video_path=request.video_path,
+        start_time=moment["start"],
+        end_time=moment["end"],
+        output_path=str(output_path),
+        subtitle_path=subtitle_arg,
+        style_name=request.caption_style,
+        force_style_string=final_style,
+        subtitle_offset=moment["start"],
+        threads=threads
+    )
+
+    return _clip_result(i, moment, final_path)
+
+
+def _use_batch_cut(moments: list) -> bool:
+    """
+    A single-pass batch decodes everything between the first clip start and the last clip end,
+    so it only wins over separate seeks when the clips cover most of that span.
+    """
+    if len(moments) < 2:
+        return False
+    span = max(m["end"] for m in moments) - min(m["start"] for m in moments)
+    covered = sum(m["end"] - m["start"] for m in moments)
+    return span > 0 and covered / span >= BATCH_MIN_COVERAGE
+
+
+def _cut_batch(moments: list, subtitle_arg: str, request, final_style: str) -> list:
+    """
+    Cuts all clips with one FFmpeg invocation (see VideoProcessor.cut_video_batch).
+    """
+    clips = []
+    for i, moment in enumerate(moments):
+        log_debug(f"Processing Clip {i}: {moment['start']}-{moment['end']}")
+        clips.append({
+            "start": moment["start"],
+            "end": moment["end"],
+            "output_path": str(get_video_processor().output_dir / f"{request.file_id}_short_{i+1}.mp4"),
+            "subtitle_path": subtitle_arg,
+            "style_name": request.caption_style,
+            "force_style_string": final_style,
+            "subtitle_offset": moment["start"]
+        })
+
+    log_debug(f"Cutting {len(clips)} clips in one FFmpeg pass")
+    final_paths = get_video_processor().cut_video_batch(request.video_path, clips)
+    return [_clip_result(i, moment, path) for i, (moment, path) in enumerate(zip(moments, final_paths))]
+
+
+async def _cut_parallel(moments: list, subtitle_arg: str, request, final_style: str) -> list:
+    """
+    Runs _cut_one for every moment on a small thread pool; returns results in order,
+    with the exception in place of a clip that failed.
+    """
+    loop = asyncio.get_running_loop()
+    workers = min(len(moments), MAX_PARALLEL_CUTS)
+    if get_video_processor().nvenc:
+        # Each cut is one NVENC session; stay under the GPU's limit
+        workers = min(workers, NVENC_MAX_SESSIONS)
+    # Split the cores between concurrent encodes instead of each libx264 spawning ~1.5x cores
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # No `with`: its exit joins the workers on the event-loop thread, so a cancelled
+    # stream (client disconnect) would stall the server until every running encode ends
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        return await asyncio.gather(
+            *[
+                loop.run_in_executor(executor, _cut_one, i, moment, subtitle_arg, request, final_style, threads)
+                for i, moment in enumerate(moments)
+            ],
+            return_exceptions=True
+        )
+    finally:
+        # Queued clips are dropped; encodes already running finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 class ProcessRequest(BaseModel):
     file_id: str = None # Optional if video_url is provided
     video_path: str = None # Optional if video_url is provided
@@ -26,22 +199,28 @@ class ProcessRequest(BaseModel):
     custom_bg_color: str = None # Expected format: #RRGGBB
     custom_size: int = None
 
-@router.post("")
-async def process_video(request: ProcessRequest):
+def _stage(stage: str, progress: float) -> dict:
+    return {"stage": stage, "progress": progress}
+
+
+async def _process_stages(request: ProcessRequest):
     """
-    Trigger full video processing pipeline:
+    Full video processing pipeline, as an async generator of progress events:
     1. Download (if URL) or Use Local File.
     2. Extract Audio.
     3. Transcribe Audio (Whisper or Local).
     4. Analyze for best moments (Heuristic or LLM).
     5. Cut/Crop the best clips with Captions.
+    Yields {"stage", "progress"} dicts; the last one is stage "done" with the "result".
+    Raises HTTPException on fatal errors.
     """
     
     # Handle URL Input
     if request.video_url:
+        yield _stage("download", 0.05)
         try:
             print(f"Downloading from URL: {request.video_url}")
-            request.video_path = downloader.download_video(request.video_url)
+            request.video_path = await downloader.download_video_async(request.video_url)
             request.file_id = Path(request.video_path).stem
         except Exception as e:
              raise HTTPException(status_code=400, detail=f"Download failed: {str(e)}")
@@ -49,19 +228,16 @@ async def process_video(request: ProcessRequest):
     if not request.video_path or not Path(request.video_path).exists():
         raise HTTPException(status_code=404, detail="Video file not found")
 
-    # DEBUG LOGGING CONSTANT
-    DEBUG_LOG_FILE = "debug_process_log.txt"
-    def log_debug(msg):
-        with open(DEBUG_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(f"{msg}\n")
-
     log_debug(f"--- START PROCESSING {request.file_id} ---")
 
+    audio_path = None
+
     # 0. Pre-process: Trim source video if needed
     if request.processing_start_time is not None or request.processing_end_time is not None:
+        yield _stage("trim", 0.1)
         try:
             log_debug(f"Trimming source video: {request.video_path} ({request.processing_start_time}-{request.processing_end_time})")
-            trimmed_path = video_processor.output_dir / f"{request.file_id}_trimmed.mp4"
+            trimmed_path = get_video_processor().output_dir / f"{request.file_id}_trimmed.mp4"
             
             # Default to 0 start if only end provided is rare, but handle it
             start = request.processing_start_time if request.processing_start_time else 0.0
@@ -81,12 +257,17 @@ async def process_video(request: ProcessRequest):
             # I'll add `trim_video_source` to video_processor next.
             
             # Assuming it exists or I will add it.
-            request.video_path = video_processor.trim_source_video(
+            # The trim writes the audio for transcription in the same FFmpeg run
+            trimmed_audio = trimmed_path.with_suffix(".wav")
+            request.video_path = get_video_processor().trim_source_video(
                 request.video_path, 
                 trimmed_path, 
                 start, 
-                request.processing_end_time
+                request.processing_end_time,
+                audio_output_path=trimmed_audio
             )
+            if trimmed_audio.exists():
+                audio_path = str(trimmed_audio)
             log_debug(f"Trimmed video saved to: {request.video_path}")
             
         except Exception as e:
@@ -97,22 +278,25 @@ async def process_video(request: ProcessRequest):
             raise HTTPException(status_code=500, detail=f"Failed to trim video: {str(e)}")
 
 
-    # 1. Extract Audio
-    try:
-        audio_path = video_processor.extract_audio(request.video_path)
-        log_debug(f"Audio extracted: {audio_path}")
-    except Exception as e:
-        log_debug(f"Audio extraction failed: {e}")
-        print(f"Audio extraction failed: {e}")
-        raise HTTPException(status_code=500, detail="Audio extraction failed")
+    # 1. Extract Audio (already done if the trim above wrote it)
+    yield _stage("extract_audio", 0.15)
+    if not audio_path:
+        try:
+            audio_path = get_video_processor().extract_audio(request.video_path)
+            log_debug(f"Audio extracted: {audio_path}")
+        except Exception as e:
+            log_debug(f"Audio extraction failed: {e}")
+            print(f"Audio extraction failed: {e}")
+            raise HTTPException(status_code=500, detail="Audio extraction failed")
 
 
     # 2. Transcribe
+    yield _stage("transcribe", 0.2)
     transcript = None
     try:
         print(f"Starting transcription... (Language: {request.language})")
         log_debug(f"Starting transcription for {audio_path} (Language: {request.language})")
-        transcript = transcriber.transcribe_audio(audio_path, language=request.language)
+        transcript = await transcriber.transcribe_audio_async(audio_path, language=request.language)
         
         if transcript:
              log_debug(f"Transcription result: {len(transcript.get('text', ''))} chars")
@@ -128,11 +312,11 @@ async def process_video(request: ProcessRequest):
         log_debug(f"Transcription failed entirely: {e}")
         print(f"Transcription failed entirely: {e}")
         # Log to file to debug
-        with open("error_log.txt", "a") as f:
-            f.write(f"Transcription Error (Lang: {request.language}): {str(e)}\n")
+        _err.error(f"Transcription Error (Lang: {request.language}): {str(e)}")
         # Proceed with transcript = None
 
     # 3. Analyze
+    yield _stage("analyze", 0.5)
     moments = []
     segments = []
     
@@ -149,15 +333,15 @@ async def process_video(request: ProcessRequest):
 
         print(f"Transcript length: {len(text)}. Analysis...")
         log_debug(f"Analyzing {len(text)} chars with LLM...")
-        moments = analyzer.analyze_transcript(text, segments, duration=request.clip_duration)
+        moments = await analyzer.analyze_transcript(text, segments, duration=request.clip_duration)
         log_debug(f"LLM returned {len(moments)} moments.")
     
     # Save transcript for regeneration
     if transcript:
         try:
-             transcript_path = video_processor.output_dir / f"{request.file_id}_transcript.json"
-             with open(transcript_path, "w", encoding="utf-8") as f:
-                 json.dump(segments, f, ensure_ascii=False)
+             transcript_path = get_video_processor().output_dir / f"{request.file_id}_transcript.json"
+             with open(transcript_path, "wb") as f:
+                 f.write(orjson.dumps(segments))
              log_debug(f"Transcript saved to {transcript_path}")
         except Exception as e:
              log_debug(f"Failed to save transcript: {e}")
@@ -191,130 +375,96 @@ async def process_video(request: ProcessRequest):
             clip_duration=request.clip_duration
         )
         
-        # Filter out overlaps
-        def is_overlapping(new_m, existing_ms, threshold=10):
-            for ex in existing_ms:
-                # Check if start time is within 'threshold' seconds of existing
-                if abs(new_m["start"] - ex["start"]) < threshold:
-                    return True
-            return False
-            
-        added_count = 0
-        for hm in heuristic_moments:
-            if added_count >= needed:
-                break
-            
-            if not is_overlapping(hm, moments):
-                hm["reason"] = "Heuristic Backfill"
-                moments.append(hm)
-                added_count += 1
-                
-        # Sort by start time to keep logical order (optional, but nice)
-        moments.sort(key=lambda x: x["start"])
+        # Keep only heuristic moments that do not overlap the AI ones
+        backfill_moments(moments, heuristic_moments, needed)
+
+    # Style is identical for every clip of this request, build it once
+    final_style = build_style(
+        STYLE_MAP.get(request.caption_style, STYLE_MAP["Classic"]),
+        hex_to_ass(request.custom_color),
+        hex_to_ass(request.custom_bg_color),
+        request.custom_size
+    )
 
-    generated_clips = []
-    
     # 4. Cut Clips
-    for i, moment in enumerate(moments):
-        output_path = video_processor.output_dir / f"{request.file_id}_short_{i+1}.mp4"
-        srt_path = video_processor.output_dir / f"{request.file_id}_short_{i+1}.srt"
-        
-        log_debug(f"Processing Clip {i}: {moment['start']}-{moment['end']}")
-        
+    yield _stage("cut", 0.6)
+    generated_clips = []
+    batch_done = False
+    # One SRT for the whole source; each cut shifts its frames onto it
+    master_srt = _make_master_srt(segments, request, final_style)
+
+    # Densely packed clips: decode the source once and encode every clip from that pass
+    if _use_batch_cut(moments):
         try:
-            # Generate SRT if we have segments (Even if we used Heuristic analysis!)
-            # Crucial Fix: Use segments for captions even if 'moments' came from 'detect_high_energy_moments'
-            subtitle_arg = None
-            if segments:
-                try:
-                    log_debug(f"Generating SRT to {srt_path}")
-                    video_processor.generate_word_level_srt(   
-                        segments, 
-                        str(srt_path), 
-                        start_offset=moment["start"]
-                    )
-                    subtitle_arg = str(srt_path)
-                    log_debug(f"SRT generated. Exists? {Path(srt_path).exists()}")
-                except Exception as e:
-                    print(f"SRT generation failed for clip {i}: {e}")
-                    log_debug(f"SRT generation failed: {e}")
-
-            # Construct Style String if custom options are present
-            base_style = STYLE_MAP.get(request.caption_style, STYLE_MAP["Classic"])
-            final_style = base_style
-
-            if request.custom_color:
-                # Convert #RRGGBB to &HBBGGRR&
-                hex_color = request.custom_color.lstrip('#')
-                if len(hex_color) == 6:
-                    r = hex_color[0:2]
-                    g = hex_color[2:4]
-                    b = hex_color[4:6]
-                    ass_color = f"&H{b}{g}{r}&" 
-                    # Replace PrimaryColour
-                    final_style = re.sub(r"PrimaryColour=&H[0-9A-Fa-f]+&", f"PrimaryColour={ass_color}", final_style)
-
-            if request.custom_bg_color:
-                # If BG Color is provided, switch to Box style logic (simplified)
-                hex_bg = request.custom_bg_color.lstrip('#')
-                if len(hex_bg) == 6:
-                    r = hex_bg[0:2]
-                    g = hex_bg[2:4]
-                    b = hex_bg[4:6]
-                    ass_bg_color = f"&H{b}{g}{r}&"
-                    
-                    # Force BorderStyle=3
-                    final_style = re.sub(r"BorderStyle=\d+", "BorderStyle=3", final_style)
-                    final_style = re.sub(r"Shadow=\d+", "Shadow=0", final_style)
-                    final_style = re.sub(r"OutlineColour=&H[0-9A-Fa-f]+&", f"OutlineColour={ass_bg_color}", final_style)
-
-            if request.custom_size:
-                final_style = re.sub(r"Fontsize=\d+", f"Fontsize={request.custom_size}", final_style)
-
-            # Cut and Resize to Vertical with Captions
-            log_debug(f"Cutting video (Subtitles: {subtitle_arg})")
-            final_path = video_processor.cut_video(
-                video_path=request.video_path,
-                start_time=moment["start"],
-                end_time=moment["end"],
-                output_path=str(output_path),
-                subtitle_path=subtitle_arg,
-                style_name=request.caption_style,
-                force_style_string=final_style
-            )
-            
-            # Clean up SRT file
-            if subtitle_arg and Path(subtitle_arg).exists():
-                try:
-                    # os.remove(subtitle_arg) # Disabled for debugging
-                    pass
-                except:
-                    pass
-            
-            generated_clips.append({
-                "path": str(final_path),
-                "url": f"/static/{Path(final_path).name}",
-                "reason": moment.get("reason", "AI Selected"),
-                "start": moment["start"],
-                "end": moment["end"],
-                "title": moment.get("title", f"Clip {i+1}"),
-                "description": moment.get("description", ""),
-                "hashtags": moment.get("hashtags", [])
-            })
-            
+            generated_clips = await asyncio.to_thread(_cut_batch, moments, master_srt, request, final_style)
+            batch_done = True
         except Exception as e:
-            print(f"Error processing clip {i}: {str(e)}")
-            log_debug(f"Error processing clip {i}: {e}")
-            pass
-
-    return {
-        "status": "completed",
-        "original_file": request.file_id,
-        "transcript": transcript if transcript else "No Transcript Available",
-        "clips": generated_clips
+            print(f"Batch cut failed, cutting clips individually: {e}")
+            log_debug(f"Batch cut failed: {e}")
+
+    # Otherwise each clip is an independent FFmpeg run, so overlap them on a small thread pool
+    # instead of encoding one after another (and blocking the event loop meanwhile).
+    if moments and not batch_done:
+        results = await _cut_parallel(moments, master_srt, request, final_style)
+
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                print(f"Error processing clip {i}: {str(result)}")
+                log_debug(f"Error processing clip {i}: {result}")
+                continue
+            generated_clips.append(result)
+
+    yield {
+        "stage": "done",
+        "progress": 1.0,
+        "result": {
+            "status": "completed",
+            "original_file": request.file_id,
+            "transcript": transcript if transcript else "No Transcript Available",
+            "clips": generated_clips
+        }
     }
 
 
+@router.post("")
+async def process_video(request: ProcessRequest):
+    """
+    Runs the whole pipeline and returns the clips in one JSON response.
+    """
+    result = None
+    async for event in _process_stages(request):
+        if event["stage"] == "done":
+            result = event["result"]
+    return result
+
+
+@router.post("/stream")
+async def process_video_stream(request: ProcessRequest, http_request: Request):
+    """
+    Same pipeline as /process, streamed as Server-Sent Events:
+    "stage" events ({"stage", "progress"}) at each milestone, then one "done" event with
+    the same payload /process returns, or an "error" event ({"status_code", "detail"}).
+    Stops between stages once the client disconnects.
+    """
+    async def events():
+        stages = _process_stages(request)
+        try:
+            async for event in stages:
+                if await http_request.is_disconnected():
+                    log_debug(f"Client disconnected, stopping {request.file_id or request.video_url}")
+                    break
+                if event["stage"] == "done":
+                    yield {"event": "done", "data": orjson.dumps(jsonable_encoder(event["result"])).decode()}
+                else:
+                    yield {"event": "stage", "data": orjson.dumps(event).decode()}
+        except HTTPException as e:
+            yield {"event": "error", "data": orjson.dumps({"status_code": e.status_code, "detail": e.detail}).decode()}
+        finally:
+            await stages.aclose()
+
+    return EventSourceResponse(events())
+
+
 class RegenerateRequest(BaseModel):
     file_id: str
     start_time: float
@@ -329,69 +479,41 @@ async def regenerate_video(request: RegenerateRequest):
     print(f"Regenerating {request.file_id} [{request.start_time}-{request.end_time}] Style: {request.caption_style}")
     
     # 1. Load Transcript
-    transcript_path = video_processor.output_dir / f"{request.file_id}_transcript.json"
+    transcript_path = get_video_processor().output_dir / f"{request.file_id}_transcript.json"
     if not transcript_path.exists():
         raise HTTPException(status_code=404, detail="Transcript file not found. Cannot regenerate.")
     
-    with open(transcript_path, "r", encoding="utf-8") as f:
-        segments = json.load(f)
+    segments = _load_segments(transcript_path, transcript_path.stat().st_mtime)
     
     # 2. Generate SRT
-    # Use a unique suffix for regen to avoid caching/overwriting issues?
-    # Or just use "regen" prefix?
-    import time
-    ts = int(time.time())
-    output_filename = f"{request.file_id}_regen_{ts}.mp4"
-    output_path = video_processor.output_dir / output_filename
-    srt_path = video_processor.output_dir / f"{request.file_id}_regen_{ts}.srt"
+    # Random suffix: two regenerations in the same second must not overwrite each other's files
+    suffix = uuid.uuid4().hex[:8]
+    output_filename = f"{request.file_id}_regen_{suffix}.mp4"
+    output_path = get_video_processor().output_dir / output_filename
+    srt_path = get_video_processor().output_dir / f"{request.file_id}_regen_{suffix}.ass"
+
+    # 3. Construct Style String (baked into the .ass below)
+    final_style = build_style(
+        STYLE_MAP.get(request.caption_style, STYLE_MAP["Classic"]),
+        hex_to_ass(request.custom_color),
+        hex_to_ass(request.custom_bg_color),
+        request.custom_size
+    )
+
+    print(f"Final Style String: {final_style}")
     
     try:
-        video_processor.generate_word_level_srt(segments, str(srt_path), start_offset=request.start_time)
+        get_video_processor().generate_word_level_srt(
+            segments, str(srt_path),
+            start_offset=request.start_time,
+            end_offset=request.end_time,
+            style_name=request.caption_style,
+            ass_style=final_style
+        )
     except Exception as e:
         print(f"Error generating SRT: {e}")
         raise HTTPException(status_code=500, detail="SRT generation failed")
 
-    # 3. Construct Style String
-    base_style = STYLE_MAP.get(request.caption_style, STYLE_MAP["Classic"])
-    final_style = base_style
-
-    if request.custom_color:
-        # Convert #RRGGBB to &HBBGGRR&
-        # Strip #
-        hex_color = request.custom_color.lstrip('#')
-        if len(hex_color) == 6:
-            r = hex_color[0:2]
-            g = hex_color[2:4]
-            b = hex_color[4:6]
-            ass_color = f"&H{b}{g}{r}&" 
-            # Replace PrimaryColour
-            final_style = re.sub(r"PrimaryColour=&H[0-9A-Fa-f]+&", f"PrimaryColour={ass_color}", final_style)
-
-    if request.custom_bg_color:
-        # If BG Color is provided, we switch to Box style (BorderStyle=3)
-        # Convert #RRGGBB to &HBBGGRR&
-        hex_bg = request.custom_bg_color.lstrip('#')
-        if len(hex_bg) == 6:
-            r = hex_bg[0:2]
-            g = hex_bg[2:4]
-            b = hex_bg[4:6]
-            ass_bg_color = f"&H{b}{g}{r}&"
-            
-            # Force BorderStyle=3
-            final_style = re.sub(r"BorderStyle=\d+", "BorderStyle=3", final_style)
-            # Set Shadow=0 to avoid weird look with box
-            final_style = re.sub(r"Shadow=\d+", "Shadow=0", final_style)
-            # Use OutlineColour for Box Background color in ASS with BorderStyle=3
-            # Or use BackColour? FFmpeg usually maps OutlineColour to box color for BorderStyle=3
-            # Let's replace OutlineColour with our custom BG color
-            final_style = re.sub(r"OutlineColour=&H[0-9A-Fa-f]+&", f"OutlineColour={ass_bg_color}", final_style)
-
-    if request.custom_size:
-        # Replace Fontsize
-        final_style = re.sub(r"Fontsize=\d+", f"Fontsize={request.custom_size}", final_style)
-
-    print(f"Final Style String: {final_style}")
-
     # 4. Cut Video
     # We need to find the original video path?
     # We assume it is in uploads with {file_id}.mp4? Or we need to look it up.
@@ -407,7 +529,7 @@ async def regenerate_video(request: RegenerateRequest):
             raise HTTPException(status_code=404, detail="Original video file not found")
 
     try:
-        final_path = video_processor.cut_video(
+        final_path = get_video_processor().cut_video(
             video_path=str(video_path),
             start_time=request.start_time,
             end_time=request.end_time,
@@ -2,10 +2,24 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from pathlib import Path
 from services.analysis import analyzer
-import json
+from functools import lru_cache
+import orjson
 
 router = APIRouter()
 
+
+@lru_cache(maxsize=64)
+def _load_context(transcript_path: Path, mtime: float) -> str:
+    """
+    Joined text of the first transcript segments. Keyed on mtime so a re-processed
+    video is read again; clips of the same video share one read.
+    """
+    with open(transcript_path, "rb") as f:
+        segments = orjson.loads(f.read())
+    # Extract text from segments
+    return " ".join(seg.get("text", "") for seg in segments[:50])
+
+
 class RocketRequest(BaseModel):
     clip_path: str  # Path to the video clip
     clip_title: str = ""  # Optional title hint
@@ -29,15 +43,12 @@ async def generate_rocket_content(request: RocketRequest):
             transcript_path = Path("processed") / f"{file_id}_transcript.json"
             
             if transcript_path.exists():
-                with open(transcript_path, "r", encoding="utf-8") as f:
-                    segments = json.load(f)
-                    # Extract text from segments
-                    video_context = " ".join([seg.get("text", "") for seg in segments[:50]])
+                video_context = _load_context(transcript_path, transcript_path.stat().st_mtime)
         except Exception as e:
             print(f"Could not load transcript: {e}")
     
     # Generate viral content using AI
-    result = analyzer.generate_viral_content(
+    result = await analyzer.generate_viral_content(
         video_context=video_context,
         clip_title=request.clip_title,
         clip_reason=request.clip_reason
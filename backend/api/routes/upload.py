@@ -1,6 +1,6 @@
-import shutil
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, HTTPException
+import aiofiles
 import uuid
 
 router = APIRouter()
@@ -8,6 +8,17 @@ router = APIRouter()
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# 1 MiB chunks keep memory flat while avoiding tiny read/write syscalls
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+async def _save_upload(file: UploadFile, file_path: Path):
+    """
+    Streams the upload to disk in chunks without blocking the event loop.
+    """
+    async with aiofiles.open(file_path, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await out.write(chunk)
+
 @router.post("")
 async def upload_video(file: UploadFile = File(...)):
     """
@@ -24,8 +35,7 @@ async def upload_video(file: UploadFile = File(...)):
     file_path = UPLOAD_DIR / saved_filename
 
     try:
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await _save_upload(file, file_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
 
@@ -55,8 +65,7 @@ async def upload_watermark(file: UploadFile = File(...)):
     file_path = WATERMARK_DIR / saved_filename
 
     try:
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await _save_upload(file, file_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not save watermark: {str(e)}")
 
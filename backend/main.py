@@ -1,13 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from api.routes import upload, process
-
-app = FastAPI(title="Auto Shorts Maker API", version="1.0.0")
-
+from pathlib import Path
+from api.routes import upload, process, share, rocket
+from services.downloader import downloader
+from services.transcription import transcriber
+from services.analysis import analyzer
+import asyncio
+import os
 import socket
 import subprocess
 
+app = FastAPI(title="Auto Shorts Maker API", version="1.0.0")
+
 @app.on_event("startup")
 async def startup_event():
     print("--- STARTUP NETWORK DIAGNOSTICS ---")
@@ -39,6 +44,17 @@ async def startup_event():
         print(f"Startup Network Test Failed: {e}")
     print("--- END NETWORK DIAGNOSTICS ---")
 
+    # Preload models/clients so the first /process request is not a cold start.
+    # Trade-off: higher idle RSS (local Whisper stays resident) for a faster first request.
+    # Both run in the background so the server accepts requests meanwhile
+    # (and a slow or stuck Gemini handshake cannot hold up startup).
+    app.state.whisper_warmup = asyncio.create_task(asyncio.to_thread(transcriber.warmup))
+    app.state.gemini_warmup = asyncio.create_task(analyzer.warmup())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await downloader.close()
+
 # CORS Configuration
 origins = [
     "http://localhost:3000",  # Next.js frontend (dev)
@@ -56,7 +72,6 @@ origins = [
 ]
 
 # Allow all origins in production for flexibility (can be restricted later)
-import os
 if os.getenv("RENDER"):
     origins.append("*")
 
@@ -71,12 +86,12 @@ app.add_middleware(
 # Include Routers
 app.include_router(upload.router, prefix="/api/upload", tags=["Upload"])
 app.include_router(process.router, prefix="/api/process", tags=["Process"])
-from api.routes import share, rocket
 app.include_router(share.router, prefix="/api/share", tags=["Share"])
 app.include_router(rocket.router, prefix="/api/rocket", tags=["Rocket Share"])
 
 
-# Serve Processed Videos
+# Serve Processed Videos (the VideoProcessor that also creates this is built lazily)
+Path("processed").mkdir(exist_ok=True)
 app.mount("/static", StaticFiles(directory="processed"), name="static")
 
 @app.get("/")
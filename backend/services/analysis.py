@@ -1,9 +1,113 @@
 import subprocess
+import bisect
 import json
 import re
 import os
+import hashlib
+import tempfile
 import google.generativeai as genai
+from functools import lru_cache
 from pathlib import Path
+from pydantic import BaseModel, RootModel, ValidationError, model_validator
+
+# blake3 hashes multi-KB transcripts faster than sha256; optional
+try:
+    from blake3 import blake3 as _hash_fn
+except ImportError:
+    _hash_fn = hashlib.sha256
+
+# PyAV reads the container header in-process (a few ms) instead of forking ffprobe.
+# It ships with faster-whisper, but keep ffprobe as a fallback if it is missing.
+try:
+    import av
+    AV_AVAILABLE = True
+except ImportError:
+    av = None
+    AV_AVAILABLE = False
+
+
+@lru_cache(maxsize=128)
+def _duration_cached(video_path: str, mtime: float, size: int) -> float:
+    """
+    Reads the container duration with PyAV, falling back to ffprobe if PyAV is missing
+    or fails. Keyed on (path, mtime, size) so a re-written file is probed again;
+    raises on failure so errors are not cached.
+    """
+    if AV_AVAILABLE:
+        try:
+            container = av.open(video_path, metadata_errors="ignore")
+            try:
+                if container.duration is not None:
+                    return float(container.duration) / av.time_base
+            finally:
+                container.close()
+        except Exception as e:
+            print(f"PyAV could not read duration, falling back to ffprobe: {e}")
+
+    from services.video_processing import get_video_processor
+
+    command = [
+        get_video_processor().ffprobe_path, 
+        "-hide_banner", "-loglevel", "error", 
+        "-show_entries", "format=duration", 
+        "-of", "default=noprint_wrappers=1:nokey=1", 
+        video_path
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe error: {result.stderr}")
+    return float(result.stdout.strip())
+
+
+def backfill_moments(moments: list, candidates: list, needed: int, threshold: float = 10) -> list:
+    """
+    Appends up to `needed` candidates (e.g. heuristic moments) that do not start within
+    `threshold` seconds of an existing moment, then sorts moments by start. Modifies moments.
+    """
+    # Keep existing start times sorted so only the nearest neighbours need checking
+    existing_starts = sorted(m["start"] for m in moments)
+
+    def is_overlapping(new_m):
+        idx = bisect.bisect_left(existing_starts, new_m["start"])
+        for j in (idx - 1, idx):
+            if 0 <= j < len(existing_starts) and abs(existing_starts[j] - new_m["start"]) < threshold:
+                return True
+        return False
+
+    added_count = 0
+    for candidate in candidates:
+        if added_count >= needed:
+            break
+        if not is_overlapping(candidate):
+            candidate["reason"] = "Heuristic Backfill"
+            moments.append(candidate)
+            bisect.insort(existing_starts, candidate["start"])
+            added_count += 1
+
+    # Sort by start time to keep logical order
+    moments.sort(key=lambda x: x["start"])
+    return moments
+
+
+class Moment(BaseModel):
+    start: float
+    end: float
+    reason: str = ""
+    score: float = 0.8
+    title: str = ""
+    description: str = ""
+    hashtags: list[str] = []
+
+
+class MomentList(RootModel[list[Moment]]):
+    @model_validator(mode="before")
+    @classmethod
+    def unwrap(cls, data):
+        # The LLM sometimes returns {"clips": [...]} or a single bare object instead of a list
+        if isinstance(data, dict):
+            return data.get("clips", [data])
+        return data
+
 
 class ContentAnalyzer:
     def __init__(self):
@@ -15,8 +119,49 @@ class ContentAnalyzer:
             self.model = None
             print("GEMINI_API_KEY not found. Analysis will fallback to heuristic.")
 
+        # Content-addressed cache of analysis results, so regenerate/retry skips the LLM.
+        # Kept out of processed/, which is served publicly under /static.
+        self.cache_dir = Path.home() / ".cache" / "auto_shorts" / "llm_cache"
+
+    async def warmup(self):
+        """
+        Opens the Gemini async client (connection + TLS) with a token count,
+        so the first analysis does not pay the handshake.
+        """
+        if not self.model:
+            return
+        try:
+            await self.model.count_tokens_async("warmup")
+            print("Gemini client warmed up.")
+        except Exception as e:
+            print(f"Gemini warmup failed: {e}")
+
+    def _cache_key(self, text: str, duration: int) -> str:
+        return _hash_fn(f"{duration}|{text}".encode("utf-8")).hexdigest()
 
-    def analyze_transcript(self, transcript_text: str, segments: list, duration: int = 60) -> list:
+    def _read_cache(self, key: str):
+        cache_path = self.cache_dir / f"{key}.json"
+        if not cache_path.exists():
+            return None
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable analysis cache {cache_path}: {e}")
+            return None
+
+    def _write_cache(self, key: str, result):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file first so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_dir / f"{key}.json")
+        except Exception as e:
+            print(f"Failed to write analysis cache: {e}")
+
+    async def analyze_transcript(self, transcript_text: str, segments: list, duration: int = 60) -> list:
         """
         Analyzes the transcript to find the most viral/engaging segment.
         Returns a list of clips with start/end times.
@@ -25,11 +170,15 @@ class ContentAnalyzer:
             print("No Gemini Model available for analysis. Using heuristics.")
             return []
 
+        # One "start|text" line per segment; word-level timings and JSON keys only cost tokens
+        compact = "\n".join(f"{int(s['start'])}|{s['text'].strip()}" for s in segments[:200])
+
         prompt = f"""
         Analyze the following video transcript segments and identify the most viral, funny, or engaging parts suitable for YouTube Shorts (under {duration} seconds each).
         
-        Transcript Segments:
-        {json.dumps(segments[:100])} ... (truncated)
+        Transcript Segments (one per line, formatted as "<start_time_in_seconds>|<text>"):
+        {compact}
+        ... (truncated)
 
         Return strictly valid JSON in this format:
         [
@@ -51,27 +200,32 @@ class ContentAnalyzer:
         4. Titles and descriptions should be clickbaity and viral-optimized.
         """
 
+        cache_key = self._cache_key(transcript_text, duration)
+        cached = self._read_cache(cache_key)
+        if cached:
+            print("Using cached analysis result.")
+            return cached
+
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            # Async call so the event loop keeps serving other requests during the LLM round-trip
+            response = await self.model.generate_content_async(prompt, generation_config={"response_mime_type": "application/json"})
             
             content = response.text
-            viral_clips = json.loads(content)
-            
-            # Normalize if the LLM returns an object instead of list
-            if isinstance(viral_clips, dict) and "clips" in viral_clips:
-                viral_clips = viral_clips["clips"]
-            elif isinstance(viral_clips, dict):
-                 # Handle cases where it returns a single object wrapped in keys we didn't ask for
-                 # Try to find a list or just wrap the dict
-                 return [viral_clips] # blind hope
+            # Parse and validate in one pass; exclude_unset keeps the callers' fallbacks for missing fields
+            viral_clips = [m.model_dump(exclude_unset=True) for m in MomentList.model_validate_json(content).root]
             
+            if viral_clips:
+                self._write_cache(cache_key, viral_clips)
             return viral_clips
 
+        except ValidationError as e:
+            print(f"Analysis returned malformed clips: {e}")
+            return []
         except Exception as e:
             print(f"Analysis error: {e}")
             return []
 
-    def generate_viral_content(self, video_context: str, clip_title: str = "", clip_reason: str = "") -> dict:
+    async def generate_viral_content(self, video_context: str, clip_title: str = "", clip_reason: str = "") -> dict:
         """
         Generates viral captions, descriptions, and hashtags for social media sharing.
         Uses Gemini AI to analyze video context and create engaging content.
@@ -120,7 +274,8 @@ class ContentAnalyzer:
         """
 
         try:
-            response = self.model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+            # Async call so the event loop keeps serving other requests during the LLM round-trip
+            response = await self.model.generate_content_async(prompt, generation_config={"response_mime_type": "application/json"})
             content = response.text
             result = json.loads(content)
             
@@ -145,7 +300,6 @@ class ContentAnalyzer:
         Fallback: Selects interesting parts based on position (evenly distributed).
         """
         duration = self.get_video_duration(video_path)
-        duration = self.get_video_duration(video_path)
         if not duration:
             print("Warning: Could not determine video duration. Assuming 10 minutes (600s) fallback to generate clips.")
             duration = 600.0 # Fallback 10 mins
@@ -184,37 +338,13 @@ class ContentAnalyzer:
         return clips
 
     def get_video_duration(self, video_path: str) -> float:
-        # Robustly find ffprobe using video_processor's discovered ffmpeg path as a hint
-        from services.video_processing import video_processor
-        
-        ffmpeg_path = Path(video_processor.ffmpeg_path)
-        # Assuming ffprobe is next to ffmpeg
-        ffprobe_path = ffmpeg_path.parent / "ffprobe.exe"
-        
-        if ffprobe_path.exists():
-             ffprobe_cmd = str(ffprobe_path)
-        else:
-             # Check for ffprobe without extension (Linux/Mac)
-             ffprobe_path_no_ext = ffmpeg_path.parent / "ffprobe"
-             if ffprobe_path_no_ext.exists():
-                  ffprobe_cmd = str(ffprobe_path_no_ext)
-             else:
-                  # Fallback to system path
-                  ffprobe_cmd = "ffprobe"
-
-        command = [
-            ffprobe_cmd, 
-            "-v", "error", 
-            "-show_entries", "format=duration", 
-            "-of", "default=noprint_wrappers=1:nokey=1", 
-            str(video_path)
-        ]
+        """
+        Returns the duration in seconds (0.0 if unknown). Cached per file version,
+        so repeated calls for the same video do not re-spawn ffprobe.
+        """
         try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            if result.returncode != 0:
-                print(f"ffprobe error: {result.stderr}")
-                return 0.0
-            return float(result.stdout.strip())
+            st = os.stat(video_path)
+            return _duration_cached(str(video_path), st.st_mtime, st.st_size)
         except Exception as e:
             print(f"Error getting duration: {e}")
             return 0.0
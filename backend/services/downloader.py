@@ -1,12 +1,175 @@
 import yt_dlp
+import yt_dlp.version
 from pathlib import Path
+from contextlib import closing
+import asyncio
+import aiohttp
+import aiofiles
+import functools
+import logging
+import os
+import requests
+import shutil
+import socket
+import sqlite3
+import subprocess
+import time
 import uuid
-from services.video_processing import video_processor
+from services.video_processing import get_video_processor
+
+# Debug output is lazy (%-args), so it costs nothing unless DEBUG logging is enabled
+logger = logging.getLogger(__name__)
+if os.getenv("DEBUG_DL"):
+    # Downloader debug output on stderr without touching the app's logging config
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(logging.StreamHandler())
+
+# Parallel fragment workers per HLS/DASH download (yt-dlp default is 1)
+YDL_CONCURRENT_FRAGMENTS = int(os.getenv("YDL_CONCURRENT_FRAGMENTS", "8"))
+# Progressive downloads are fetched in ranged chunks of this size instead of one long GET.
+# Every chunk carries a Range header, which YouTube serves without its pacing pauses.
+YDL_HTTP_CHUNK_SIZE = int(os.getenv("YDL_HTTP_CHUNK_SIZE", str(10 * 1024 * 1024)))
+
+# Read/write size for remote downloads (256KB: 32x fewer writes than the old 8KB)
+REMOTE_CHUNK_SIZE = 256 * 1024
+
+# aria2c splits one file across parallel Range connections; used when installed
+ARIA2C_AVAILABLE = shutil.which("aria2c") is not None
+
+# Re-requests of the same URL within this window reuse the downloaded file
+META_CACHE_TTL = 3600
+
+# Shared HTTP session for the remote downloader: keeps connections (and TLS state)
+# pooled across downloads instead of handshaking on every call.
+_session: aiohttp.ClientSession = None
+
+async def get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
+
+
+@functools.cache
+def _dns_probe():
+    try:
+        logger.debug("DNS Test google.com: %s", socket.gethostbyname('google.com'))
+        logger.debug("DNS Test youtube.com: %s", socket.gethostbyname('youtube.com'))
+    except Exception as e:
+        logger.debug("DNS Test failed: %s", e)
+
+
+def _expected_length(headers) -> int:
+    """
+    Body size from Content-Length, or 0 if unknown. Compressed responses are decoded
+    on the fly, so their Content-Length does not match the bytes written.
+    """
+    if headers.get("Content-Encoding", "identity") != "identity":
+        return 0
+    return int(headers.get("Content-Length") or 0)
+
+
+def _preallocate(fileno: int, size: int):
+    # Reserve the whole file up front: contiguous extents, and ENOSPC before streaming rather than halfway
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fileno, 0, size)
+        except OSError as e:
+            logger.debug("posix_fallocate failed: %s", e)
+
+
+def _check_complete(path: str, written: int, expected: int):
+    """
+    Raises unless the remote download is usable: non-empty, and either exactly
+    Content-Length bytes or, when the length is unknown (piped responses), a file
+    ffprobe can read a duration from.
+    """
+    if not written:
+        raise IOError("Remote download returned no data")
+    if expected:
+        if written != expected:
+            raise IOError(f"Remote download incomplete: got {written} of {expected} bytes")
+        return
+    result = subprocess.run(
+        [get_video_processor().ffprobe_path, "-v", "error",
+         "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0 or not result.stdout.strip():
+        raise IOError(f"Remote download is not a readable video: {result.stderr.strip()}")
+
+
+def _discard(path: str):
+    # Drop a rejected remote download, so it is neither cached nor picked up by the local fallback
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _remote_endpoint(remote_api: str) -> str:
+    # Ensure URL ends with /download if not provided
+    return remote_api if remote_api.endswith("/download") else f"{remote_api.rstrip('/')}/download"
+
 
 class VideoDownloader:
     def __init__(self, download_dir: str = "uploads"):
         self.download_dir = Path(download_dir)
         self.download_dir.mkdir(exist_ok=True)
+        # url -> downloaded file, so a repeat request skips extraction and download entirely
+        self.meta_cache = self.download_dir / ".meta_cache.sqlite"
+        # closing() closes the connection; its own context manager only commits
+        with closing(sqlite3.connect(self.meta_cache)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(url TEXT PRIMARY KEY, filepath TEXT, created_at REAL, format_id TEXT)"
+            )
+
+    def _cached_download(self, url: str) -> str:
+        """
+        Returns the file downloaded for url within META_CACHE_TTL, if it still exists,
+        hard-linked under a fresh file_id so this request's outputs do not collide
+        with those of the request that downloaded it.
+        """
+        try:
+            with closing(sqlite3.connect(self.meta_cache)) as conn, conn:
+                row = conn.execute(
+                    "SELECT filepath FROM cache WHERE url = ? AND created_at > ?",
+                    (url, time.time() - META_CACHE_TTL)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Download cache lookup failed: %s", e)
+            return None
+        if not row or not Path(row[0]).exists():
+            return None
+        cached = Path(row[0])
+        path = self.download_dir / f"{uuid.uuid4()}{cached.suffix}"
+        try:
+            os.link(cached, path)
+        except OSError as e:
+            logger.warning("Could not link cached download: %s", e)
+            return None
+        logger.debug("Reusing cached download for %s: %s", url, cached)
+        return str(path.absolute())
+
+    def _remember_download(self, url: str, filepath: str, format_id: str = None):
+        try:
+            with closing(sqlite3.connect(self.meta_cache)) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (url, filepath, created_at, format_id) VALUES (?, ?, ?, ?)",
+                    (url, filepath, time.time(), format_id)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Download cache write failed: %s", e)
+
+    async def close(self):
+        """
+        Closes the shared HTTP session (called on app shutdown).
+        """
+        global _session
+        if _session is not None and not _session.closed:
+            await _session.close()
+        _session = None
 
     def download_video(self, url: str) -> str:
         """
@@ -16,129 +179,183 @@ class VideoDownloader:
         If not, falls back to local yt-dlp.
         Returns the absolute path to the downloaded file.
         """
-        import os
-        import requests
-        import shutil
+        cached = self._cached_download(url)
+        if cached:
+            return cached
 
         file_id = str(uuid.uuid4())
         # Template: uploads/UUID.mp4
-        output_template = str(self.download_dir / f"{file_id}.%(ext)s")
         local_filename = str(self.download_dir / f"{file_id}.mp4")
 
         # 1. Remote Downloader Strategy
         remote_api = os.getenv("DOWNLOADER_API_URL")
         if remote_api:
-            print(f"DEBUG: Using remote downloader at {remote_api}")
+            logger.debug("Using remote downloader at %s", remote_api)
             try:
-                # Ensure URL ends with /download if not provided
-                endpoint = remote_api if remote_api.endswith("/download") else f"{remote_api.rstrip('/')}/download"
-                
-                with requests.get(endpoint, params={"url": url}, stream=True, timeout=600) as r:
+                with requests.get(_remote_endpoint(remote_api), params={"url": url}, stream=True, timeout=600) as r:
                     r.raise_for_status()
                     # Determine extension from headers if possible, or default to mp4
                     # For now, just save as mp4 since we requested mp4/best
+                    expected = _expected_length(r.headers)
+                    written = 0
                     with open(local_filename, 'wb') as f:
-                        for chunk in r.iter_content(chunk_size=8192): 
-                            f.write(chunk)
+                        _preallocate(f.fileno(), expected)
+                        for chunk in r.iter_content(chunk_size=REMOTE_CHUNK_SIZE): 
+                            written += f.write(chunk)
+                _check_complete(local_filename, written, expected)
                 
-                print(f"DEBUG: Remote download successful: {local_filename}")
-                return str(Path(local_filename).absolute())
+                logger.debug("Remote download successful: %s", local_filename)
+                path = str(Path(local_filename).absolute())
+                self._remember_download(url, path)
+                return path
             except Exception as e:
-                print(f"ERROR: Remote download failed: {e}")
-                print("Falling back to local download...")
+                logger.error("Remote download failed: %s", e)
+                _discard(local_filename)
+                logger.warning("Falling back to local download...")
                 # Fallthrough to local strategies
         
-        # 2. Local Strategies (Original Logic)
+        # 2. Local Strategies
+        return self._download_local(url, file_id)
+
+    async def download_video_async(self, url: str) -> str:
+        """
+        Async variant of download_video for request handlers.
+        The remote downloader streams over the shared aiohttp session;
+        the local yt-dlp fallback runs in a worker thread.
+        """
+        cached = await asyncio.to_thread(self._cached_download, url)
+        if cached:
+            return cached
+
+        file_id = str(uuid.uuid4())
+        local_filename = str(self.download_dir / f"{file_id}.mp4")
+
+        remote_api = os.getenv("DOWNLOADER_API_URL")
+        if remote_api:
+            logger.debug("Using remote downloader at %s", remote_api)
+            try:
+                await self._download_remote_async(_remote_endpoint(remote_api), url, local_filename)
+                logger.debug("Remote download successful: %s", local_filename)
+                path = str(Path(local_filename).absolute())
+                await asyncio.to_thread(self._remember_download, url, path)
+                return path
+            except Exception as e:
+                logger.error("Remote download failed: %s", e)
+                await asyncio.to_thread(_discard, local_filename)
+                logger.warning("Falling back to local download...")
+
+        return await asyncio.to_thread(self._download_local, url, file_id)
+
+    async def download_many(self, urls: list, concurrency: int = 4) -> list:
+        """
+        Downloads several URLs concurrently (at most `concurrency` at once; keep it
+        <= 4 so YouTube's per-IP rate limiter does not kick in).
+        Returns paths in the same order as urls, with None for downloads that failed.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _one(url: str):
+            async with sem:
+                try:
+                    return await self.download_video_async(url)
+                except Exception as e:
+                    logger.error("Download failed for %s: %s", url, e)
+                    return None
+
+        return await asyncio.gather(*(_one(url) for url in urls))
+
+    async def _download_remote_async(self, endpoint: str, url: str, local_filename: str):
+        session = await get_session()
+        async with session.get(endpoint, params={"url": url}, timeout=aiohttp.ClientTimeout(total=600)) as r:
+            r.raise_for_status()
+            expected = _expected_length(r.headers)
+            written = 0
+            # aiofiles keeps disk writes off the event loop
+            async with aiofiles.open(local_filename, 'wb') as f:
+                await asyncio.to_thread(_preallocate, f.fileno(), expected)
+                async for chunk in r.content.iter_chunked(REMOTE_CHUNK_SIZE):
+                    written += await f.write(chunk)
+        await asyncio.to_thread(_check_complete, local_filename, written, expected)
+
+    def _find_download(self, file_id: str) -> str:
+        # One directory pass with a prefix match; glob would stat every entry in uploads/
+        prefix = f"{file_id}."
+        with os.scandir(self.download_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(prefix):
+                    return entry.path
+        return None
+
+    def _download_local(self, url: str, file_id: str) -> str:
+        """
+        Downloads with the local yt-dlp strategies into uploads/<file_id>.<ext>.
+        """
+        output_template = str(self.download_dir / f"{file_id}.%(ext)s")
+
         ydl_opts = {
             'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
             'outtmpl': output_template,
             'noplaylist': True,
+            'concurrent_fragment_downloads': YDL_CONCURRENT_FRAGMENTS,
+            'http_chunk_size': YDL_HTTP_CHUNK_SIZE,
+            # Persist yt-dlp's player/signature cache across restarts
+            'cachedir': str(self.download_dir / '.ytdlp_cache'),
         }
 
-        if video_processor.ffmpeg_path and Path(video_processor.ffmpeg_path).is_absolute():
-            ydl_opts['ffmpeg_location'] = video_processor.ffmpeg_path
+        if ARIA2C_AVAILABLE:
+            # 8 connections per file, 1MB pieces
+            ydl_opts['external_downloader'] = {'default': 'aria2c'}
+            ydl_opts['external_downloader_args'] = {'aria2c': ['-x', '8', '-s', '8', '-k', '1M']}
+
+        ffmpeg_path = get_video_processor().ffmpeg_path
+        if ffmpeg_path and Path(ffmpeg_path).is_absolute():
+            ydl_opts['ffmpeg_location'] = ffmpeg_path
 
         # Add robust options - REMOVED ignoreerrors to fail fast and see real error
+        # One config with the settings the old fallback attempts converged on (IPv4 + generous
+        # timeouts/retries), so a failing network does not repeat the whole extraction 4 times.
         ydl_opts.update({
             'updatetime': False,
             'force_ipv4': True,
-            'source_address': '0.0.0.0', # Bind to IPv4 interface
             'nocheckcertificate': True,
-            'socket_timeout': 15,
+            'socket_timeout': 30,
             'retries': 10,
+            'fragment_retries': 10,
             # 'ignoreerrors': True, # Removed to debug
             # 'quiet': True,        # Removed to debug
             'no_warnings': True,
         })
         
-        print(f"DEBUG: ydl_opts: {ydl_opts}")
+        logger.debug("ydl_opts: %s", ydl_opts)
+        # Version check to ensure update worked
+        logger.debug("yt-dlp version: %s", yt_dlp.version.__version__)
 
-        # DEBUG: Print version to ensure update worked
-        import yt_dlp.version
-        print(f"DEBUG: yt-dlp version: {yt_dlp.version.__version__}")
+        # DEBUG: Test DNS resolution before yt-dlp (opt-in, once per process)
+        if os.getenv("DEBUG_DL"):
+            _dns_probe()
 
-        # DEBUG: Test DNS resolution before yt-dlp
-        import socket
         try:
-            print(f"DEBUG: DNS Test google.com: {socket.gethostbyname('google.com')}")
-            print(f"DEBUG: DNS Test youtube.com: {socket.gethostbyname('youtube.com')}")
-        except Exception as e:
-            print(f"DEBUG: DNS Test failed: {e}")
-
-        # Strategy Order:
-        # 1. Standard (Let system/yt-dlp decide, usually best for Docker)
-        # 2. Force IPv4 (Fixes some IPv6-only network issues)
-        # 3. User Agent Spoofing (Fixes some bot blocking)
-        
-        base_opts = ydl_opts.copy()
-        if 'source_address' in base_opts:
-            del base_opts['source_address']
-        if 'force_ipv4' in base_opts:
-            del base_opts['force_ipv4']
-
-        attempts = [
-            {"name": "Standard", "opts": {**base_opts}},
-            # Fix: Use DNS over HTTPS (DoH) - Best for restricting environments
-            {"name": "Google DoH", "opts": {**base_opts, 'doh_url': 'https://dns.google/dns-query', 'force_ipv4': True}}, 
-            # Fallback to Cloudflare DoH
-            {"name": "Cloudflare DoH", "opts": {**base_opts, 'doh_url': 'https://cloudflare-dns.com/dns-query', 'force_ipv4': True}},
-            
-            # Explicit DNS servers (UDP 53)
-            {"name": "Google DNS", "opts": {**base_opts, 'dns_servers': ['8.8.8.8', '8.8.4.4'], 'force_ipv4': True}}, 
-        ]
-        
-        # NOTE: 'dns_servers' is supported by yt-dlp to override socket.getaddrinfo behavior internally
-        # provided the phython dependency versions support it.
-
-        
-        last_error = None
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=True)
+                
+                if info is None:
+                    raise Exception("yt-dlp extract_info returned None")
+                
+                # Success!
+                # yt-dlp reports the final (post-merge) file; extensions vary (mp4, mkv, webm)
+                path = (info.get("requested_downloads") or [{}])[0].get("filepath")
+                if not path or not Path(path).exists():
+                    path = self._find_download(file_id)
+                if not path:
+                    # Fallback if file not found by prefix (shouldnt happen with outtmpl)
+                    path = ydl.prepare_filename(info)
+                path = str(Path(path).absolute())
 
-        for attempt in attempts:
-            print(f"DEBUG: Trying download strategy: {attempt['name']}")
-            try:
-                with yt_dlp.YoutubeDL(attempt['opts']) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    
-                    if info is None:
-                        raise Exception("yt-dlp extract_info returned None")
-                    
-                    # Success!
-                    # Find extracted file
-                    # We look for files matching the ID because extensions vary (mp4, mkv, webm)
-                    for file in self.download_dir.glob(f"{file_id}.*"):
-                        return str(file.absolute())
-                    
-                    # Fallback if file not found by glob (shouldnt happen with outtmpl)
-                    filename = ydl.prepare_filename(info)
-                    return str(Path(filename).absolute())
-                    
-            except Exception as e:
-                print(f"Strategy {attempt['name']} failed: {e}")
-                last_error = e
-                # Continue to next attempt
-        
-        # If all failed
-        print(f"All download strategies failed. Last error: {last_error}")
-        raise last_error
+                self._remember_download(url, path, info.get("format_id"))
+                return path
+                
+        except Exception as e:
+            logger.error("Download failed: %s", e)
+            raise
 
 downloader = VideoDownloader()
@@ -0,0 +1,46 @@
+import re
+
+# Style overrides applied on top of a STYLE_MAP entry
+_PRIMARY_RE = re.compile(r"PrimaryColour=&H[0-9A-Fa-f]+&")
+_BORDER_RE = re.compile(r"BorderStyle=\d+")
+_SHADOW_RE = re.compile(r"Shadow=\d+")
+_OUTLINE_RE = re.compile(r"OutlineColour=&H[0-9A-Fa-f]+&")
+_FONTSIZE_RE = re.compile(r"Fontsize=\d+")
+
+
+def hex_to_ass(hex_color: str = None) -> str:
+    """
+    Converts #RRGGBB to the ASS &HBBGGRR& color format.
+    Returns None if the color is missing or malformed.
+    """
+    if not hex_color:
+        return None
+    h = hex_color.lstrip('#')
+    if len(h) != 6:
+        return None
+    return f"&H{h[4:6]}{h[2:4]}{h[0:2]}&"
+
+
+def build_style(base: str, ass_color: str = None, ass_bg_color: str = None, custom_size: int = None) -> str:
+    """
+    Applies the user's caption overrides to a base FFmpeg style string.
+    Colors must already be in ASS format (see hex_to_ass).
+    """
+    final_style = base
+
+    if ass_color:
+        # Replace PrimaryColour
+        final_style = _PRIMARY_RE.sub(f"PrimaryColour={ass_color}", final_style)
+
+    if ass_bg_color:
+        # If BG Color is provided, we switch to Box style (BorderStyle=3)
+        final_style = _BORDER_RE.sub("BorderStyle=3", final_style)
+        # Set Shadow=0 to avoid weird look with box
+        final_style = _SHADOW_RE.sub("Shadow=0", final_style)
+        # FFmpeg maps OutlineColour to the box color for BorderStyle=3
+        final_style = _OUTLINE_RE.sub(f"OutlineColour={ass_bg_color}", final_style)
+
+    if custom_size:
+        final_style = _FONTSIZE_RE.sub(f"Fontsize={custom_size}", final_style)
+
+    return final_style
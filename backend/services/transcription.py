@@ -1,6 +1,8 @@
 from pathlib import Path
+import asyncio
 import openai
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,10 +14,39 @@ if not os.getenv("RENDER"):
     try:
         from faster_whisper import WhisperModel
         FASTER_WHISPER_AVAILABLE = True
+        try:
+            # faster-whisper >= 1.1; batches VAD chunks through the model on GPU
+            from faster_whisper import BatchedInferencePipeline
+        except ImportError:
+            BatchedInferencePipeline = None
     except ImportError:
         FASTER_WHISPER_AVAILABLE = False
         print("faster-whisper not available. Using OpenAI API only for transcription.")
 
+# Local model size: tiny / base / small / medium ('tiny' is fast and small, 'base' is better but larger)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")
+
+# Startup preload of the local model: "1" always, "0" never,
+# unset = only when it is the primary path (no OpenAI key)
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD")
+
+# Chunks decoded together by the batched GPU pipeline
+WHISPER_BATCH_SIZE = 8
+
+
+def _whisper_device() -> tuple:
+    """
+    (device, compute_type) for the local model: float16 on a CUDA GPU, int8 on CPU.
+    Uses CTranslate2 (installed with faster-whisper) so torch is not needed just to probe.
+    """
+    try:
+        import ctranslate2
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda", "float16"
+    except Exception:
+        pass
+    return "cpu", "int8"
+
 
 class Transcriber:
     def __init__(self):
@@ -24,6 +55,9 @@ class Transcriber:
         
         # Lazy load local model only if needed (or if user wants free mode)
         self.local_model = None
+        self.local_batched = False
+        # Startup warmup and a first request may both try to load it
+        self._model_lock = threading.Lock()
 
     def _get_local_model(self):
         # Prevent local model loading on Render to save memory
@@ -32,13 +66,44 @@ class Transcriber:
 
         if not FASTER_WHISPER_AVAILABLE:
             raise RuntimeError("faster-whisper is not installed. Please use OpenAI API or install faster-whisper locally.")
-        if not self.local_model:
-            print("Loading local Whisper model (tiny)... This may take a moment.")
-            # 'tiny' is fast and small. 'base' is better but larger.
-            # Using 'int8' quantization for speed on CPU.
-            self.local_model = WhisperModel("tiny", device="cpu", compute_type="int8")
+        with self._model_lock:
+            if not self.local_model:
+                device, compute_type = _whisper_device()
+                print(f"Loading local Whisper model ({WHISPER_MODEL}, {device}/{compute_type})... This may take a moment.")
+                if device == "cuda":
+                    self.local_model = WhisperModel(WHISPER_MODEL, device=device, compute_type=compute_type)
+                    # Batching only pays off on GPU; on CPU the single-model path is as fast
+                    if BatchedInferencePipeline is not None:
+                        self.local_model = BatchedInferencePipeline(model=self.local_model)
+                        self.local_batched = True
+                else:
+                    # Using 'int8' quantization for speed on CPU; num_workers lets concurrent requests overlap
+                    self.local_model = WhisperModel(
+                        WHISPER_MODEL, device=device, compute_type=compute_type,
+                        cpu_threads=os.cpu_count() or 0, num_workers=2
+                    )
         return self.local_model
 
+    def warmup(self):
+        """
+        Loads the local model and runs it once on a second of silence, so the first
+        request does not pay the model load or CTranslate2's first-run setup.
+        See WHISPER_PRELOAD: by default only when local Whisper is the primary path,
+        since it costs a few hundred MB of RSS for the life of the process.
+        """
+        if os.getenv("RENDER") or not FASTER_WHISPER_AVAILABLE or WHISPER_PRELOAD == "0":
+            return
+        if self.client and WHISPER_PRELOAD != "1":
+            return
+        try:
+            import numpy as np
+            model = self._get_local_model()
+            segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), language="en")
+            list(segments)  # transcribe() is lazy; consume it so the decoder actually runs
+            print("Local Whisper model warmed up.")
+        except Exception as e:
+            print(f"Whisper warmup failed (will load on first request): {e}")
+
 
     def transcribe_audio(self, audio_path: str, language: str = None) -> dict:
         """
@@ -47,12 +112,10 @@ class Transcriber:
         """
         if self.client:
             print("Using OpenAI Whisper API...")
-            audio_file = open(audio_path, "rb")
             try:
                 # Prepare arguments
                 kwargs = {
                     "model": "whisper-1",
-                    "file": audio_file,
                     "response_format": "verbose_json",
                     "timestamp_granularities": ["segment", "word"]
                 }
@@ -71,14 +134,13 @@ class Transcriber:
                 # So we are good on OpenAI side just by using the correct method. 
                 # but let's be safe.
                 
-                transcript = self.client.audio.transcriptions.create(**kwargs)
-                return transcript
+                with open(audio_path, "rb") as audio_file:
+                    kwargs["file"] = audio_file
+                    return self.client.audio.transcriptions.create(**kwargs)
             except Exception as e:
                 print(f"OpenAI Transcription error: {e}")
                 print("Falling back to local model...")
                 # Allow fallback if API fails
-            finally:
-                audio_file.close()
 
         # Fallback / Free Mode
         try:
@@ -91,6 +153,11 @@ class Transcriber:
             transcribe_kwargs = {"word_timestamps": True, "task": "transcribe"}
             if language:
                 transcribe_kwargs["language"] = language
+            # Skip silent stretches instead of decoding them (timestamps stay on the original timeline)
+            transcribe_kwargs["vad_filter"] = True
+            transcribe_kwargs["vad_parameters"] = {"min_silence_duration_ms": 500}
+            if self.local_batched:
+                transcribe_kwargs["batch_size"] = WHISPER_BATCH_SIZE
                 
             segments, info = model.transcribe(audio_path, **transcribe_kwargs)
             
@@ -98,30 +165,18 @@ class Transcriber:
 
             # Convert generator to list and format like OpenAI response
             # OpenAI segment: {start, end, text, words: [{word, start, end}]}
-            formatted_segments = []
-            full_text = []
-
-            for segment in segments:
-                # print(f"   Segment: {segment.text}") # Debug print (Disabled to prevent Unicode errors on Windows console)
-                seg_words = []
-                if segment.words:
-                    for w in segment.words:
-                        seg_words.append({
-                            "word": w.word,
-                            "start": w.start,
-                            "end": w.end
-                        })
-                
-                formatted_segments.append({
+            formatted_segments = [
+                {
                     "start": segment.start,
                     "end": segment.end,
                     "text": segment.text,
-                    "words": seg_words
-                })
-                full_text.append(segment.text)
+                    "words": [{"word": w.word, "start": w.start, "end": w.end} for w in (segment.words or ())]
+                }
+                for segment in segments
+            ]
 
             return {
-                "text": " ".join(full_text),
+                "text": " ".join(seg["text"] for seg in formatted_segments),
                 "segments": formatted_segments,
                 "detected_language": info.language
             }
@@ -130,6 +185,13 @@ class Transcriber:
             print(f"Local Transcription error: {e}")
             raise
 
+    async def transcribe_audio_async(self, audio_path: str, language: str = None) -> dict:
+        """
+        transcribe_audio in a worker thread, so request handlers keep the event loop free
+        during the API round-trip or local inference.
+        """
+        return await asyncio.to_thread(self.transcribe_audio, audio_path, language)
+
     def transcribe_with_roman_telugu(self, audio_path: str, language: str = None) -> dict:
         """
         Transcribes audio and converts Telugu text to Roman Telugu for captions.
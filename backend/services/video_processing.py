@@ -1,7 +1,30 @@
 import subprocess
+import functools
+import json
 import os
 import shutil
+import tempfile
+import numpy as np
 from pathlib import Path
+from xml.sax.saxutils import escape
+
+# Resolved FFmpeg path and NVENC probe result, so startup skips the WinGet scan and test encode
+TOOL_CACHE_PATH = Path.home() / ".cache" / "auto_shorts" / "ffmpeg.json"
+WINGET_PACKAGES_DIR = Path.home() / "AppData" / "Local" / "Microsoft" / "WinGet" / "Packages"
+
+# Audio for transcription: 16kHz mono PCM is what Whisper consumes, so there is no
+# MP3 encode here and no MP3 decode in the transcriber
+WHISPER_AUDIO_ARGS = ["-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", "-f", "wav"]
+
+# Concurrent NVENC encodes to allow. Consumer GeForce drivers cap sessions per system
+# (3 on older drivers, 5-8 on newer), and every output of a batch cut is one session.
+NVENC_MAX_SESSIONS = int(os.getenv("NVENC_MAX_SESSIONS", "3"))
+
+# Optional caption fonts (e.g. NirmalaUI.ttf; not shipped, it is licensed with Windows).
+# When this has fonts, libass loads them from here and fontconfig scans only this directory
+# instead of every system font on each caption cut.
+CAPTION_FONTS_DIR = Path(os.getenv("CAPTION_FONTS_DIR", Path(__file__).resolve().parent.parent / "assets" / "fonts"))
+FONTCONFIG_PATH = TOOL_CACHE_PATH.parent / "fonts.conf"
 
 
 # Define available caption styles
@@ -15,13 +38,249 @@ STYLE_MAP = {
     "Classic": "Alignment=10,Fontname=Nirmala UI,Fontsize=30,PrimaryColour=&HFFFFFF&,OutlineColour=&H000000&,BorderStyle=1,Outline=1,Shadow=0,MarginV=20"
 }
 
+# How words are grouped into caption lines. A line is closed when adding the next word would
+# make it longer than max_chars, span more than max_duration seconds, or follow a pause
+# longer than max_gap seconds. Styles not listed use DEFAULT_CAPTION_GROUPING.
+DEFAULT_CAPTION_GROUPING = {"max_chars": 18, "max_duration": 1.2, "max_gap": 0.35}
+CAPTION_GROUPING = {
+    "Karaoke": {"max_chars": 0, "max_duration": 0.0, "max_gap": 0.0},  # One word per line
+}
+
+def _filter_path(path) -> str:
+    """
+    Absolute path for a filter option value: forward slashes, and the drive colon escaped
+    because ':' separates filter options. Goes inside '...' in the graph.
+    """
+    return str(Path(path).absolute()).replace("\\", "/").replace(":", "\\:")
+
+
+def _time_parts(seconds: np.ndarray, fraction_scale: int) -> tuple:
+    # Hours, minutes, seconds and truncated fraction (ms for 1000, cs for 100) as int lists
+    hours = (seconds // 3600).astype(np.int64).tolist()
+    minutes = ((seconds % 3600) // 60).astype(np.int64).tolist()
+    secs = (seconds % 60).astype(np.int64).tolist()
+    fractions = ((seconds - np.trunc(seconds)) * fraction_scale).astype(np.int64).tolist()
+    return hours, minutes, secs, fractions
+
+
+def _srt_timestamps(seconds: np.ndarray) -> list:
+    """
+    SRT "HH:MM:SS,mmm" strings for an array of non-negative times in seconds.
+    Milliseconds are truncated, not rounded.
+    """
+    return [f"{h:02}:{m:02}:{s:02},{ms:03}" for h, m, s, ms in zip(*_time_parts(seconds, 1000))]
+
+
+def _ass_timestamps(seconds: np.ndarray) -> list:
+    """
+    ASS "H:MM:SS.cc" strings (centiseconds, truncated) for an array of non-negative times.
+    """
+    return [f"{h}:{m:02}:{s:02}.{cs:02}" for h, m, s, cs in zip(*_time_parts(seconds, 100))]
+
+
+# Style fields and defaults of the header FFmpeg generates when it converts SRT for libass;
+# force_style overrides some of these, and _ass_header bakes the same result into the file.
+_ASS_STYLE_FIELDS = [
+    "Name", "Fontname", "Fontsize", "PrimaryColour", "SecondaryColour", "OutlineColour", "BackColour",
+    "Bold", "Italic", "Underline", "StrikeOut", "ScaleX", "ScaleY", "Spacing", "Angle",
+    "BorderStyle", "Outline", "Shadow", "Alignment", "MarginL", "MarginR", "MarginV", "Encoding"
+]
+_ASS_DEFAULT_STYLE = "Default,Arial,16,&Hffffff,&Hffffff,&H0,&H0,0,0,0,0,100,100,0,0,1,1,0,2,10,10,10,1".split(",")
+# force_style takes libass' legacy SSA alignment (e.g. 10 = middle center);
+# a [V4+ Styles] line takes numpad alignment (5 = middle center)
+_LEGACY_TO_NUMPAD_ALIGNMENT = {1: 1, 2: 2, 3: 3, 5: 7, 6: 8, 7: 9, 9: 4, 10: 5, 11: 6}
+
+
+def _ass_header(style_string: str) -> str:
+    """
+    [Script Info] + [V4+ Styles] + [Events] header with a force_style string
+    ("Key=Value,...", see STYLE_MAP) baked into the Default style.
+    """
+    style = dict(zip(_ASS_STYLE_FIELDS, _ASS_DEFAULT_STYLE))
+    fields = {name.lower(): name for name in _ASS_STYLE_FIELDS}
+    for item in style_string.split(","):
+        key, _, value = item.partition("=")
+        name = fields.get(key.strip().lower())
+        if not name:
+            continue
+        value = value.strip()
+        if name == "Alignment" and value.lstrip("-").isdigit():
+            value = str(_LEGACY_TO_NUMPAD_ALIGNMENT.get(int(value), int(value)))
+        style[name] = value
+    return (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        "PlayResX: 384\n"
+        "PlayResY: 288\n"
+        "ScaledBorderAndShadow: yes\n"
+        "YCbCr Matrix: None\n"
+        "\n"
+        "[V4+ Styles]\n"
+        f"Format: {', '.join(_ASS_STYLE_FIELDS)}\n"
+        f"Style: {','.join(style[name] for name in _ASS_STYLE_FIELDS)}\n"
+        "\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+
+
 class VideoProcessor:
     def __init__(self, upload_dir: str = "uploads", output_dir: str = "processed"):
         self.upload_dir = Path(upload_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
-        self.ffmpeg_path = self._get_binary_path("ffmpeg")
-        print(f"VideoProcessor initialized. FFmpeg path: {self.ffmpeg_path}")
+        cached = self._read_tool_cache()
+        if cached:
+            self.ffmpeg_path, self.nvenc = cached["ffmpeg"], cached["nvenc"]
+        else:
+            self.ffmpeg_path = self._get_binary_path("ffmpeg")
+            self.nvenc = self._probe_nvenc()
+            self._write_tool_cache()
+        self.ffprobe_path = self._get_ffprobe_path()
+        self.fonts_dir, self.subtitle_env = self._setup_caption_fonts()
+        print(f"VideoProcessor initialized. FFmpeg path: {self.ffmpeg_path} (encoder: {'h264_nvenc' if self.nvenc else 'libx264'})")
+
+    def _setup_caption_fonts(self) -> tuple:
+        """
+        (fonts_dir, env) for FFmpeg runs that burn subtitles. Both None (system fonts,
+        inherited env) unless CAPTION_FONTS_DIR contains font files.
+        """
+        try:
+            has_fonts = any(p.suffix.lower() in (".ttf", ".otf", ".ttc") for p in CAPTION_FONTS_DIR.iterdir())
+        except OSError:
+            has_fonts = False
+        if not has_fonts:
+            return None, None
+
+        fonts_dir = CAPTION_FONTS_DIR.resolve()
+        try:
+            FONTCONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            FONTCONFIG_PATH.write_text(
+                '<?xml version="1.0"?>\n'
+                '<!DOCTYPE fontconfig SYSTEM "fonts.dtd">\n'
+                f"<fontconfig><dir>{escape(str(fonts_dir))}</dir>"
+                f"<cachedir>{escape(str(FONTCONFIG_PATH.parent / 'fontconfig'))}</cachedir></fontconfig>\n",
+                encoding="utf-8"
+            )
+        except Exception as e:
+            print(f"Failed to write fontconfig file, using system fonts config: {e}")
+            return fonts_dir, None
+        return fonts_dir, {**os.environ, "FONTCONFIG_FILE": str(FONTCONFIG_PATH)}
+
+    def _tool_fingerprint(self) -> dict:
+        """
+        Cheap checks that decide whether the cached lookup is still valid:
+        what PATH resolves to now, and the WinGet Packages dir mtime (changes on install/uninstall).
+        """
+        try:
+            winget_mtime = WINGET_PACKAGES_DIR.stat().st_mtime
+        except OSError:
+            winget_mtime = None
+        return {"path_hit": shutil.which("ffmpeg"), "winget_mtime": winget_mtime}
+
+    def _read_tool_cache(self):
+        try:
+            with open(TOOL_CACHE_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            ffmpeg = Path(data["ffmpeg"])
+            # A replaced/upgraded binary gets a new mtime, so it is probed again
+            if ffmpeg.stat().st_mtime != data["ffmpeg_mtime"]:
+                return None
+            if data["fingerprint"] != self._tool_fingerprint():
+                return None
+            return data
+        except Exception:
+            return None
+
+    def _write_tool_cache(self):
+        # Only cache a real binary; a bare "ffmpeg" fallback means nothing was found yet
+        ffmpeg = Path(self.ffmpeg_path)
+        if not ffmpeg.is_file():
+            return
+        try:
+            TOOL_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(TOOL_CACHE_PATH, "w", encoding="utf-8") as f:
+                json.dump({
+                    "ffmpeg": str(ffmpeg),
+                    "ffmpeg_mtime": ffmpeg.stat().st_mtime,
+                    "nvenc": self.nvenc,
+                    "fingerprint": self._tool_fingerprint()
+                }, f)
+        except Exception as e:
+            print(f"Failed to write FFmpeg cache: {e}")
+
+    def _probe_nvenc(self) -> bool:
+        """
+        True if FFmpeg has h264_nvenc and a GPU accepts a tiny test encode.
+        Many builds list nvenc even on machines without an NVIDIA driver, so the list alone is not enough.
+        """
+        try:
+            listed = subprocess.run([self.ffmpeg_path, "-hide_banner", "-encoders"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=10)
+            if "h264_nvenc" not in listed.stdout:
+                return False
+            test = subprocess.run([
+                self.ffmpeg_path, "-hide_banner", "-loglevel", "error",
+                "-f", "lavfi", "-i", "color=size=256x256:duration=0.1",
+                "-c:v", "h264_nvenc", "-f", "null", "-"
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=20)
+            return test.returncode == 0
+        except Exception:
+            return False
+
+    def _decode_args(self) -> list:
+        """
+        Input options for the source video. Decodes on the GPU when NVENC is in use;
+        frames come back to system memory because subtitles/drawtext are CPU filters.
+        Keeping frames on the GPU (scale_cuda + a pre-rendered caption layer through
+        overlay_cuda) would not avoid the round trip either: the 9:16 crop has no CUDA
+        filter, so frames would still be downloaded for it.
+        """
+        return ["-hwaccel", "cuda"] if self.nvenc else []
+
+    def _run_ffmpeg(self, command: list, env: dict = None):
+        """
+        Runs an FFmpeg command with only errors logged (-nostats -loglevel error) and stdout
+        discarded, so progress output does not pile up in Python during long encodes.
+        Raises CalledProcessError with FFmpeg's error output in .stderr.
+        """
+        command = [command[0], "-nostats", "-loglevel", "error", *command[1:]]
+        return subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              text=True, errors="replace", env=env)
+
+    def _encode_args(self) -> list:
+        """Video encoder options: h264_nvenc when available, else libx264."""
+        if self.nvenc:
+            return ["-c:v", "h264_nvenc", "-preset", "p4", "-cq", "23", "-b:v", "0"]
+        return ["-c:v", "libx264"]
+
+    def _get_ffprobe_path(self) -> str:
+        """
+        ffprobe is expected next to the discovered ffmpeg binary, else on PATH.
+        """
+        ffmpeg_path = Path(self.ffmpeg_path)
+        # Assuming ffprobe is next to ffmpeg
+        for name in ("ffprobe.exe", "ffprobe"):
+            candidate = ffmpeg_path.parent / name
+            if candidate.exists():
+                return str(candidate)
+        # Fallback to system path
+        return "ffprobe"
+
+    def has_audio_stream(self, video_path: str) -> bool:
+        """
+        Returns True if the file has at least one audio stream.
+        """
+        command = [
+            self.ffprobe_path,
+            "-hide_banner", "-loglevel", "error",
+            "-select_streams", "a",
+            "-show_entries", "stream=index",
+            "-of", "csv=p=0",
+            str(video_path)
+        ]
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return result.returncode == 0 and bool(result.stdout.strip())
 
     def add_watermark(self, video_path: str, output_path: str, 
                       watermark_text: str = None, 
@@ -38,21 +297,14 @@ class VideoProcessor:
         output_path = Path(output_path)
         
         if watermark_text:
-            # Text watermark using drawtext filter
-            # Position: bottom-right with 20px padding
-            # Semi-transparent black background box
-            filter_str = (
-                f"drawtext=text='{watermark_text}':"
-                f"fontsize={font_size}:"
-                f"fontcolor=white@{opacity}:"
-                f"borderw=2:bordercolor=black@0.5:"
-                f"x=w-tw-20:y=h-th-20"
-            )
+            filter_str = self._drawtext_filter(watermark_text, font_size, opacity)
             
             command = [
                 self.ffmpeg_path, "-y",
+                *self._decode_args(),
                 "-i", str(video_path),
                 "-vf", filter_str,
+                *self._encode_args(),
                 "-c:a", "copy",
                 str(output_path)
             ]
@@ -64,16 +316,15 @@ class VideoProcessor:
             if not watermark_image.exists():
                 raise FileNotFoundError(f"Watermark image not found: {watermark_image}")
             
-            filter_str = (
-                f"[1:v]scale=-1:80[wm];"
-                f"[0:v][wm]overlay=W-w-20:H-h-20"
-            )
+            filter_str = self._image_overlay("[0:v]")
             
             command = [
                 self.ffmpeg_path, "-y",
+                *self._decode_args(),
                 "-i", str(video_path),
                 "-i", str(watermark_image),
                 "-filter_complex", filter_str,
+                *self._encode_args(),
                 "-c:a", "copy",
                 str(output_path)
             ]
@@ -84,17 +335,33 @@ class VideoProcessor:
         
         try:
             print(f"Adding watermark: {' '.join(command)}")
-            subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._run_ffmpeg(command)
             return str(output_path)
         except subprocess.CalledProcessError as e:
-            print(f"Error adding watermark: {e}")
+            print(f"Error adding watermark: {e}\n{e.stderr}")
             raise
 
+    def _image_overlay(self, bg_label: str) -> str:
+        # PNG watermark (input 1) scaled to 80px height, over bg_label at bottom-right with 20px padding
+        return f"[1:v]scale=-1:80[wm];{bg_label}[wm]overlay=W-w-20:H-h-20"
+
+    def _drawtext_filter(self, watermark_text: str, font_size: int = 24, opacity: float = 0.8) -> str:
+        # Text watermark using drawtext filter
+        # Position: bottom-right with 20px padding
+        # Semi-transparent black background box
+        return (
+            f"drawtext=text='{watermark_text}':"
+            f"fontsize={font_size}:"
+            f"fontcolor=white@{opacity}:"
+            f"borderw=2:bordercolor=black@0.5:"
+            f"x=w-tw-20:y=h-th-20"
+        )
+
     def _get_binary_path(self, binary_name: str) -> str:
         """
         Attempts to find the binary path.
         1. Checks system PATH.
-        2. Checks common WinGet location (recursive).
+        2. Checks common WinGet location (known Gyan.FFmpeg layout, then recursive).
         """
         # 1. Check PATH
         path_in_env = shutil.which(binary_name)
@@ -104,12 +371,15 @@ class VideoProcessor:
         # 2. Check WinGet Packages (Common User Install Location)
         # We need to find: AppData/Local/Microsoft/WinGet/Packages/Gyan.FFmpeg_*/.../bin/binary_name.exe
         try:
-            home = Path.home()
-            winget_dir = home / "AppData" / "Local" / "Microsoft" / "WinGet" / "Packages"
+            winget_dir = WINGET_PACKAGES_DIR
             
             if winget_dir.exists():
-                # Search for the binary recursively in this directory
-                # Using rglob might be slow if many packages, but usually safe enough in Packages folder
+                # Gyan's packages always unpack to Gyan.FFmpeg_*/ffmpeg-<version>/bin/; checking that
+                # depth first avoids walking every other package's tree
+                for path in winget_dir.glob(f"Gyan.FFmpeg*/*/bin/{binary_name}.exe"):
+                    if path.is_file():
+                        return str(path)
+                # Other packagers: search recursively
                 for path in winget_dir.rglob(f"{binary_name}.exe"):
                     if path.is_file():
                         return str(path)
@@ -121,45 +391,41 @@ class VideoProcessor:
 
     def extract_audio(self, video_path: str, output_audio_path: str = None) -> str:
         """
-        Extracts audio from video using FFmpeg.
+        Extracts audio from video using FFmpeg, as 16kHz mono WAV (see WHISPER_AUDIO_ARGS).
         Returns the path to the extracted audio file.
         """
         video_path = Path(video_path)
         if not output_audio_path:
-            output_audio_path = self.output_dir / f"{video_path.stem}.mp3"
+            output_audio_path = self.output_dir / f"{video_path.stem}.wav"
         
         command = [
             self.ffmpeg_path, "-i", str(video_path),
-            "-q:a", "0", "-map", "a",
+            "-vn", "-map", "0:a:0", *WHISPER_AUDIO_ARGS,
             str(output_audio_path), "-y"
         ]
         
         try:
-            subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._run_ffmpeg(command)
             return str(output_audio_path)
         except subprocess.CalledProcessError as e:
-            print(f"Error extracting audio: {e}")
+            print(f"Error extracting audio: {e}\n{e.stderr}")
             raise
 
-    def generate_word_level_srt(self, segments: list, output_path: str, start_offset: float = 0.0):
+    def generate_word_level_srt(self, segments: list, output_path: str, start_offset: float = 0.0, end_offset: float = None,
+                                style_name: str = None, ass_style: str = None):
         """
         Generates an SRT file with fast-paced (word-level or small group) captions.
         segments: List of segment objects from Whisper verbose_json.
         start_offset: The start time of the video clip relative to the original video.
                         We subtract this from the transcript timestamps.
+        end_offset: Optional end time of the clip (same timeline as start_offset).
+                    Words starting at or after it are left out, so a single-clip SRT
+                    does not carry the rest of the transcript.
+        style_name: Picks the word grouping (see CAPTION_GROUPING).
+        ass_style: Optional force_style string (see STYLE_MAP). If given, writes an .ass file
+                   with this style baked in instead of an SRT, so the subtitles filter needs
+                   no force_style (see _subtitles_filter).
         """
-        def format_timestamp(seconds: float):
-            # SRT format: HH:MM:SS,ms
-            if seconds < 0: seconds = 0
-            hours = int(seconds // 3600)
-            minutes = int((seconds % 3600) // 60)
-            secs = int(seconds % 60)
-            millis = int((seconds - int(seconds)) * 1000)
-            return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
-
-        entries = []
-        counter = 1
-
         # Flatten all words if available, otherwise just use segments
         all_words = []
         for seg in segments:
@@ -173,47 +439,76 @@ class VideoProcessor:
                     "end": seg["end"]
                 })
 
-        # Group words? For now, let's do 1-2 words per line for that "snappy" feel
-        # or just 1 word if it's long? Let's do a simple greedy grouper: max 20 chars or 0.5 sec gap
-        
-        current_group = []
-        
-        for word_obj in all_words:
-            w_start = word_obj["start"] - start_offset
-            w_end = word_obj["end"] - start_offset
-            text = word_obj["word"].strip()
-
-            # Filter out things outside the clip
-            # We assume we only got segments relevant to the clip, but double check keys
-            if w_end < 0: continue
-            
-            # If start is negative but end is positive, clamp start
-            if w_start < 0: w_start = 0
+        # Times are shifted/clamped as arrays; only grouping and string formatting are per word.
+        n = len(all_words)
+        starts = np.fromiter((w["start"] for w in all_words), dtype=np.float64, count=n) - start_offset
+        ends = np.fromiter((w["end"] for w in all_words), dtype=np.float64, count=n) - start_offset
 
-            # Simple logic: One word per line for maximum impact (users love this for shorts)
-            # To make it slightly readable fast, maybe 1-2 words.
-            # Let's stick to 1 word for "Karaoke" feel unless it's very short 'a', 'the', etc.
-            
-            entries.append((w_start, w_end, text))
+        # Drop words that end before the clip (or start after it); clamp a start that straddles it to 0
+        keep = ends >= 0
+        if end_offset is not None:
+            keep &= starts < end_offset - start_offset
+        texts = [w["word"].strip() for w, k in zip(all_words, keep.tolist()) if k]
+
+        # Greedy grouping into short lines: keeps the "snappy" feel with a fraction of the entries
+        grouping = CAPTION_GROUPING.get(style_name, DEFAULT_CAPTION_GROUPING)
+        max_chars, max_duration, max_gap = grouping["max_chars"], grouping["max_duration"], grouping["max_gap"]
+        group_starts, group_ends, group_texts = [], [], []
+        for w_start, w_end, text in zip(np.maximum(starts[keep], 0).tolist(), ends[keep].tolist(), texts):
+            if group_texts:
+                joined = f"{group_texts[-1]} {text}"
+                if (len(joined) <= max_chars and w_end - group_starts[-1] <= max_duration
+                        and w_start - group_ends[-1] <= max_gap):
+                    group_ends[-1] = w_end
+                    group_texts[-1] = joined
+                    continue
+            group_starts.append(w_start)
+            group_ends.append(w_end)
+            group_texts.append(text)
 
+        if ass_style:
+            start_stamps = _ass_timestamps(np.array(group_starts, dtype=np.float64))
+            end_stamps = _ass_timestamps(np.array(group_ends, dtype=np.float64))
+            # Braces would start an override block in ASS
+            body = _ass_header(ass_style) + "".join(
+                f"Dialogue: 0,{s},{e},Default,,0,0,0,,{text.replace('{', '(').replace('}', ')')}\n"
+                for s, e, text in zip(start_stamps, end_stamps, group_texts)
+            )
+        else:
+            start_stamps = _srt_timestamps(np.array(group_starts, dtype=np.float64))
+            end_stamps = _srt_timestamps(np.array(group_ends, dtype=np.float64))
+            body = "".join(
+                f"{i}\n{s} --> {e}\n{text}\n\n"
+                for i, (s, e, text) in enumerate(zip(start_stamps, end_stamps, group_texts), 1)
+            )
         with open(output_path, "w", encoding="utf-8") as f:
-            for start, end, text in entries:
-                f.write(f"{counter}\n")
-                f.write(f"{format_timestamp(start)} --> {format_timestamp(end)}\n")
-                f.write(f"{text}\n\n")
-                counter += 1
+            f.write(body)
         
         return output_path
 
-    def trim_source_video(self, video_path: str, output_path: str, start_time: float, end_time: float = None) -> str:
+    def trim_source_video(self, video_path: str, output_path: str, start_time: float, end_time: float = None,
+                          audio_output_path: str = None) -> str:
         """
         Trims the source video to a specific range. 
-        Uses stream copy (-c copy) for speed if possible, but -ss before -i for fast seek.
+        Uses stream copy (-c copy) with -ss before -i for fast seek; nothing is re-encoded.
+        The start snaps to the previous keyframe (usually < 1s earlier), which is fine because
+        transcription and cutting both run on the trimmed file.
+        audio_output_path: Optional. Also writes the trimmed audio there (same format as
+                           extract_audio) in the same FFmpeg run, saving a second process
+                           and a second read of the file. Skipped if the source has no audio.
         """
         video_path = Path(video_path)
         output_path = Path(output_path)
+        if audio_output_path and not self.has_audio_stream(video_path):
+            audio_output_path = None
         
         command = [self.ffmpeg_path, "-y"]
+
+        if audio_output_path:
+            # The decoded audio must start on the same keyframe as the copied video:
+            # -noaccurate_seek decodes from the keyframe too, and -copyts/-start_at_zero keep
+            # source times so both outputs can be cut at the same end point (-to / atrim).
+            command.extend(["-noaccurate_seek", "-copyts", "-start_at_zero"])
         
         # Fast seek to start
         if start_time and start_time > 0:
@@ -223,54 +518,171 @@ class VideoProcessor:
         
         # Duration or End Time
         if end_time:
-            # If we used -ss before -i, timestamps are reset. 
-            # So duration is simply (end - start).
-            duration = end_time - start_time
-            command.extend(["-t", str(duration)])
+            if audio_output_path:
+                command.extend(["-to", str(end_time)])
+            else:
+                # If we used -ss before -i, timestamps are reset. 
+                # So duration is simply (end - start).
+                duration = end_time - (start_time or 0)
+                command.extend(["-t", str(duration)])
             
-        # Use stream copy for speed since we are just trimming source
-        # But stream copy on non-keyframe start might cause issues. 
-        # For precise cutting, we should re-encode. 
-        # Let's try re-encoding to be safe for analysis downstream, 
-        # but maybe use a fast preset? 
-        # Actually downstream (whisper, etc) handles audio.
-        # Let's use re-encoding to ensure valid timestamps and keyframes for precise cuts later.
-        command.extend(["-c:v", "libx264", "-preset", "fast", "-c:a", "aac"])
+        # Stream copy runs at disk speed; the caption cut later re-encodes anyway.
+        # make_zero shifts the copied packets so the output starts at 0 like a re-encode would.
+        # -map 0 keeps every video/audio track (default selection keeps one of each);
+        # subtitle/data tracks are dropped since e.g. subrip or tmcd cannot be copied into mp4.
+        command.extend(["-map", "0", "-sn", "-dn", "-ignore_unknown", "-c", "copy", "-avoid_negative_ts", "make_zero"])
         
         command.append(str(output_path))
+
+        if audio_output_path:
+            command.extend(["-map", "0:a:0", *WHISPER_AUDIO_ARGS])
+            if end_time:
+                command.extend(["-af", f"atrim=end={end_time}"])
+            command.append(str(audio_output_path))
         
-        print(f"Trimming source: {' '.join(command)}")
-        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return str(output_path)
+        try:
+            print(f"Trimming source: {' '.join(command)}")
+            self._run_ffmpeg(command)
+            return str(output_path)
+        except subprocess.CalledProcessError as e:
+            print(f"Error trimming source: {e}\n{e.stderr}")
+            raise
 
-    def cut_video(self, video_path: str, start_time: float, end_time: float, output_path: str = None, subtitle_path: str = None, style_name: str = "Classic", force_style_string: str = None) -> str:
+    def _subtitles_filter(self, subtitle_path: str, style_name: str = "Classic", force_style_string: str = None) -> str:
+        # FFmpeg requires escaping for Windows paths in filter arguments
+        escaped_sub_path = _filter_path(subtitle_path)
+        
+        if Path(subtitle_path).suffix.lower() == ".ass":
+            # Style is already baked into the file (generate_word_level_srt with ass_style)
+            subtitles = f"subtitles='{escaped_sub_path}'"
+        else:
+            # Get style string
+            if force_style_string:
+                style_str = force_style_string
+            else:
+                style_str = STYLE_MAP.get(style_name, STYLE_MAP["Classic"])
+
+            # force_style applies these styles to ALL subtitles in the file
+            subtitles = f"subtitles='{escaped_sub_path}':force_style='{style_str}'"
+        if self.fonts_dir:
+            subtitles += f":fontsdir='{_filter_path(self.fonts_dir)}'"
+        return subtitles
+
+    def _subtitle_filters(self, subtitle_path: str, style_name: str = "Classic", force_style_string: str = None, subtitle_offset: float = 0.0) -> list:
         """
-        Cuts a video segment using FFmpeg.
-        start_time and end_time should be floats (seconds).
-        If subtitle_path is provided, burns subtitles into the video using the specified style.
-        force_style_string: Optional. If present, overrides style_name with this raw FFmpeg style string.
+        Filters that burn subtitle_path into a clip whose first frame is at 0.
+        subtitle_offset is the SRT time of that first frame: 0 for a per-clip SRT,
+        the clip start for a master SRT written on the source timeline.
+        """
+        subtitles = self._subtitles_filter(subtitle_path, style_name, force_style_string)
+        if not subtitle_offset:
+            return [subtitles]
+        # Move frames onto the SRT timeline for libass, then back to 0 for the encoder
+        return [f"setpts=PTS+{subtitle_offset}/TB", subtitles, "setpts=PTS-STARTPTS"]
+
+    def _write_filter_script(self, graph: str, scripts: list) -> str:
+        """
+        Writes a filtergraph to a file in the system temp dir (not processed/, which is
+        served under /static) for -filter_script / -filter_complex_script and adds it to
+        scripts for the caller to delete in a finally. Keeps long graphs (many clips, long
+        style strings) off the command line, which is capped at ~32K chars on Windows.
+        """
+        fd, path = tempfile.mkstemp(suffix=".filter")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(graph)
+        scripts.append(path)
+        return path
+
+    def _remove_filter_scripts(self, scripts: list):
+        for path in scripts:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def cut_video_batch(self, video_path: str, clips: list) -> list:
+        """
+        Cuts several clips from one source in a single FFmpeg run, so the source is
+        opened, demuxed and decoded once instead of once per clip.
+        clips: list of dicts with start, end, output_path and optionally
+               subtitle_path, style_name, force_style_string, subtitle_offset
+               (same meaning as cut_video).
+        Returns the output paths in the same order.
+        Decoding covers everything from the first clip start to the last clip end,
+        so this pays off when the clips cover most of that span.
+        """
+        video_path = Path(video_path)
+        if self.nvenc and len(clips) > NVENC_MAX_SESSIONS:
+            # Stay under the GPU's session limit: one run per group of clips
+            return [
+                path
+                for k in range(0, len(clips), NVENC_MAX_SESSIONS)
+                for path in self.cut_video_batch(video_path, clips[k:k + NVENC_MAX_SESSIONS])
+            ]
+        n = len(clips)
+        # Seek the input to the earliest clip; trims below are relative to it
+        base = min(clip["start"] for clip in clips)
+        with_audio = self.has_audio_stream(video_path)
+
+        command = [
+            self.ffmpeg_path, "-y",
+            *self._decode_args(),
+            "-ss", str(base),
+            "-i", str(video_path)
+        ]
+
+        # One output per clip, each with its own filter chain fed by the shared decoder.
+        # (A single split= filter_complex would also work, but FFmpeg then queues frames
+        # for outputs that have not started yet and memory grows by GBs.)
+        scripts = []
+        try:
+            for clip in clips:
+                start = clip["start"] - base
+                end = clip["end"] - base
+                vf_filters = [f"trim=start={start}:end={end}", "setpts=PTS-STARTPTS", "scale=-1:1920,crop=1080:1920"]
+                if clip.get("subtitle_path"):
+                    vf_filters.extend(self._subtitle_filters(
+                        clip["subtitle_path"],
+                        clip.get("style_name", "Classic"),
+                        clip.get("force_style_string"),
+                        clip.get("subtitle_offset", 0.0)
+                    ))
+                command.extend(["-map", "0:v:0", "-filter_script:v", self._write_filter_script(",".join(vf_filters), scripts)])
+                if with_audio:
+                    command.extend(["-map", "0:a:0", "-af", f"atrim=start={start}:end={end},asetpts=PTS-STARTPTS"])
+                command.extend([*self._encode_args(), "-c:a", "aac", str(clip["output_path"])])
+
+            print(f"Running FFmpeg (batch of {n}): {' '.join(command)}")
+            self._run_ffmpeg(command, env=self.subtitle_env)
+            return [str(clip["output_path"]) for clip in clips]
+        except subprocess.CalledProcessError as e:
+            print(f"Error cutting video batch: {e}\n{e.stderr}")
+            raise
+        finally:
+            self._remove_filter_scripts(scripts)
+
+    def render_clip(self, video_path: str, start_time: float, end_time: float, output_path: str = None,
+                    subtitle_path: str = None, style_name: str = "Classic", force_style_string: str = None,
+                    subtitle_offset: float = 0.0, watermark_text: str = None, watermark_image: str = None,
+                    watermark_font_size: int = 24, watermark_opacity: float = 0.8, threads: int = None) -> str:
+        """
+        Cuts, crops to 9:16, burns subtitles and adds a watermark in one FFmpeg run
+        (one decode, one encode) instead of a cut pass followed by an add_watermark pass.
+        Subtitle arguments are as in cut_video; watermark arguments as in add_watermark.
+        threads: caps FFmpeg/encoder threads when several renders run side by side.
         """
         video_path = Path(video_path)
         if not output_path:
             output_path = self.output_dir / f"{video_path.stem}_cut.mp4"
 
-        # -vf scale=-1:1920,crop=1080:1920 is for vertical 9:16 crop (center)
+        # scale=-1:1920,crop=1080:1920 is for vertical 9:16 crop (center)
         vf_filters = ["scale=-1:1920,crop=1080:1920"]
         
         if subtitle_path:
-            # FFmpeg requires escaping for Windows paths in filter arguments
-            escaped_sub_path = str(Path(subtitle_path).absolute()).replace("\\", "/").replace(":", "\\:")
-            
-            # Get style string
-            if force_style_string:
-                style_str = force_style_string
-            else:
-                style_str = STYLE_MAP.get(style_name, STYLE_MAP["Classic"])
-            
-            # force_style applies these styles to ALL subtitles in the file
-            vf_filters.append(f"subtitles='{escaped_sub_path}':force_style='{style_str}'")
+            vf_filters.extend(self._subtitle_filters(subtitle_path, style_name, force_style_string, subtitle_offset))
 
-        filter_complex = ",".join(vf_filters)
+        if watermark_text:
+            vf_filters.append(self._drawtext_filter(watermark_text, watermark_font_size, watermark_opacity))
 
         # Note: -ss before -i is faster processing but timestamps reset. 
         # -ss after -i is frame-accurate. 
@@ -283,20 +695,71 @@ class VideoProcessor:
         
         command = [
             self.ffmpeg_path, 
+            *self._decode_args(),
             "-ss", str(start_time),
-            "-i", str(video_path),
-            "-t", str(duration),
-            "-vf", filter_complex,
-            "-c:v", "libx264", "-c:a", "aac",
-            str(output_path), "-y"
+            "-i", str(video_path)
         ]
 
+        scripts = []
         try:
-            print(f"Running FFmpeg: {' '.join(command)}")
-            subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if watermark_image and not watermark_text:
+                watermark_image = Path(watermark_image)
+                if not watermark_image.exists():
+                    raise FileNotFoundError(f"Watermark image not found: {watermark_image}")
+                graph = f"[0:v]{','.join(vf_filters)}[bg];{self._image_overlay('[bg]')}[v]"
+                command.extend([
+                    "-i", str(watermark_image),
+                    "-t", str(duration),
+                    "-filter_complex_script", self._write_filter_script(graph, scripts),
+                    "-map", "[v]", "-map", "0:a?"
+                ])
+            else:
+                graph = ",".join(vf_filters)
+                command.extend([
+                    "-t", str(duration),
+                    "-filter_script:v", self._write_filter_script(graph, scripts)
+                ])
+
+            if threads:
+                command.extend(["-threads", str(threads)])
+
+            command.extend([
+                *self._encode_args(), "-c:a", "aac",
+                str(output_path), "-y"
+            ])
+
+            print(f"Running FFmpeg: {' '.join(command)}\n  filter: {graph}")
+            self._run_ffmpeg(command, env=self.subtitle_env)
             return str(output_path)
         except subprocess.CalledProcessError as e:
-            print(f"Error cutting video: {e}")
+            print(f"Error cutting video: {e}\n{e.stderr}")
             raise
+        finally:
+            self._remove_filter_scripts(scripts)
+
+    def cut_video(self, video_path: str, start_time: float, end_time: float, output_path: str = None, subtitle_path: str = None, style_name: str = "Classic", force_style_string: str = None, subtitle_offset: float = 0.0, threads: int = None) -> str:
+        """
+        Cuts a video segment using FFmpeg.
+        start_time and end_time should be floats (seconds).
+        If subtitle_path is provided, burns subtitles into the video using the specified style.
+        force_style_string: Optional. If present, overrides style_name with this raw FFmpeg style string.
+        subtitle_offset: SRT time of the clip's first frame. Pass start_time when subtitle_path
+                         is a master SRT with source timestamps (see generate_word_level_srt).
+        threads: Optional cap on FFmpeg threads (see render_clip).
+        """
+        return self.render_clip(
+            video_path, start_time, end_time, output_path,
+            subtitle_path=subtitle_path,
+            style_name=style_name,
+            force_style_string=force_style_string,
+            subtitle_offset=subtitle_offset,
+            threads=threads
+        )
 
-video_processor = VideoProcessor()
+@functools.cache
+def get_video_processor() -> VideoProcessor:
+    """
+    Shared VideoProcessor, built on first use so importing this module does not
+    run the FFmpeg lookup/probe for callers that never touch video.
+    """
+    return VideoProcessor()
@@ -0,0 +1,46 @@
+"""
+Cancelling /api/process/stream during the cut stage must not block the event loop
+until the running FFmpeg encodes finish.
+Run from backend/: python -m unittest test_cut_cancel
+"""
+import sys
+import time
+import asyncio
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from api.routes import process
+
+CUT_SECONDS = 3
+
+
+def _slow_cut(i, moment, subtitle_arg, request, final_style, threads=None):
+    # Stands in for an FFmpeg encode
+    time.sleep(CUT_SECONDS)
+    return {"id": i}
+
+
+class CutCancelTest(unittest.TestCase):
+    def test_cancel_mid_cut_keeps_loop_responsive(self):
+        async def scenario():
+            moments = [{"start": i * 60, "end": i * 60 + 30} for i in range(3)]
+            task = asyncio.create_task(process._cut_parallel(moments, None, None, "Classic"))
+            await asyncio.sleep(0.3)  # encodes are running now
+
+            task.cancel()
+            started = time.monotonic()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.01)
+            return time.monotonic() - started
+
+        with mock.patch.object(process, "_cut_one", _slow_cut):
+            stall = asyncio.run(scenario())
+        self.assertLess(stall, 0.5, f"event loop stalled {stall:.2f}s after cancelling the cut")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@
 import sys
 import os
 import json
+import asyncio
 from pathlib import Path
 
 # Add backend directory to sys.path
@@ -9,9 +10,9 @@ backend_path = Path(r"c:\Users\nsp19\Downloads\Auto Post\backend")
 sys.path.append(str(backend_path))
 
 try:
-    from services.video_processing import video_processor
+    from services.video_processing import get_video_processor
     from services.transcription import transcriber
-    from services.analysis import analyzer
+    from services.analysis import analyzer, backfill_moments
 
     # Input File (from your uploads listing)
     # Switched to the smaller 'viral short' file for speed testing
@@ -23,65 +24,66 @@ try:
         exit(1)
 
     print(f"1. Processing File: {input_filename}")
-    
-    # 1. Extract Audio
-    print("   Extracting audio...")
-    audio_path = video_processor.extract_audio(str(input_path))
-    print(f"   Audio: {audio_path}")
-
-    # 2. Transcribe
-    print("   Transcribing (Language: te)...")
-    transcript = transcriber.transcribe_audio(audio_path, language="te")
-    text = transcript.get("text", "")
-    segments = transcript.get("segments", [])
-    print(f"   Transcription done. Length: {len(text)} chars. Segments: {len(segments)}")
-
-    # 3. Analyze
-    print("   Analyzing with Gemini...")
-    moments = analyzer.analyze_transcript(text, segments, duration=60)
-    
-    # Backfill Logic (same as in process.py)
+    video_processor = get_video_processor()
     num_shorts = 3
-    if len(moments) < num_shorts:
-        print(f"   AI returned {len(moments)} clips. Backfilling to {num_shorts}...")
-        heuristic_moments = analyzer.detect_high_energy_moments(str(input_path), num_clips=num_shorts*2, clip_duration=60)
-        
-        def is_overlapping(new_m, existing_ms, threshold=10):
-            for ex in existing_ms:
-                if abs(new_m["start"] - ex["start"]) < threshold: return True
-            return False
 
-        added = 0
-        for hm in heuristic_moments:
-            if added >= (num_shorts - len(moments)): break
-            if not is_overlapping(hm, moments):
-                hm["reason"] = "Heuristic Backfill"
-                moments.append(hm)
-                added += 1
-        moments.sort(key=lambda x: x["start"])
+    async def run_pipeline():
+        # Heuristic backfill candidates only need the video duration, so find them while
+        # the audio is extracted and transcribed instead of after the LLM call
+        heuristic_task = asyncio.create_task(asyncio.to_thread(
+            analyzer.detect_high_energy_moments, str(input_path), num_clips=num_shorts*2, clip_duration=60
+        ))
 
-    print(f"   Total Clips to Generate: {len(moments)}")
+        # 1. Extract Audio
+        print("   Extracting audio...")
+        audio_path = await asyncio.to_thread(video_processor.extract_audio, str(input_path))
+        print(f"   Audio: {audio_path}")
 
-    # 4. Cut
-    for i, moment in enumerate(moments):
-        print(f"   Cutting Clip {i+1}...")
-        output_path = video_processor.output_dir / f"MANUAL_TEST_{i+1}.mp4"
-        srt_path = video_processor.output_dir / f"MANUAL_TEST_{i+1}.srt"
-        
+        # 2. Transcribe
+        print("   Transcribing (Language: te)...")
+        transcript = await transcriber.transcribe_audio_async(audio_path, language="te")
+        text = transcript.get("text", "")
+        segments = transcript.get("segments", [])
+        print(f"   Transcription done. Length: {len(text)} chars. Segments: {len(segments)}")
+
+        # 3. Analyze, writing the master SRT (only needs the segments) during the Gemini call
+        print("   Analyzing with Gemini...")
         subtitle_arg = None
+        srt_path = video_processor.output_dir / "MANUAL_TEST_master.srt"
         if segments:
-            video_processor.generate_word_level_srt(segments, str(srt_path), start_offset=moment["start"])
-            subtitle_arg = str(srt_path)
-            
-        final_path = video_processor.cut_video(
-            video_path=str(input_path),
-            start_time=moment["start"],
-            end_time=moment["end"],
-            output_path=str(output_path),
-            subtitle_path=subtitle_arg,
-            style_name="Classic" # Testing Classic/Telugu font
-        )
-        print(f"   Clip {i+1} saved: {final_path}")
+            moments, subtitle_arg = await asyncio.gather(
+                analyzer.analyze_transcript(text, segments, duration=60),
+                asyncio.to_thread(video_processor.generate_word_level_srt, segments, str(srt_path), 0.0)
+            )
+        else:
+            moments = await analyzer.analyze_transcript(text, segments, duration=60)
+        
+        # Backfill (shared with process.py). The heuristic task is awaited either way so it
+        # is never left pending; it has long finished by now.
+        heuristic_moments = await heuristic_task
+        if len(moments) < num_shorts:
+            print(f"   AI returned {len(moments)} clips. Backfilling to {num_shorts}...")
+            backfill_moments(moments, heuristic_moments, num_shorts - len(moments))
+
+        print(f"   Total Clips to Generate: {len(moments)}")
+
+        # 4. Cut (all clips from one FFmpeg decode pass, one master SRT)
+        clips = [
+            {
+                "start": moment["start"],
+                "end": moment["end"],
+                "output_path": str(video_processor.output_dir / f"MANUAL_TEST_{i+1}.mp4"),
+                "subtitle_path": subtitle_arg,
+                "subtitle_offset": moment["start"],
+                "style_name": "Classic" # Testing Classic/Telugu font
+            }
+            for i, moment in enumerate(moments)
+        ]
+        print(f"   Cutting {len(clips)} clips in one pass...")
+        for i, final_path in enumerate(await asyncio.to_thread(video_processor.cut_video_batch, str(input_path), clips)):
+            print(f"   Clip {i+1} saved: {final_path}")
+
+    asyncio.run(run_pipeline())
 
     print("MANUAL PROCESSING COMPLETE.")
 
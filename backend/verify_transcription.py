@@ -1,15 +1,20 @@
 from services.transcription import transcriber
 import os
 
-# Find an mp3 file to test
+# Find an extracted audio file (wav, or mp3 from older runs) to test
 processed_dir = "processed"
-mp3_files = [f for f in os.listdir(processed_dir) if f.endswith(".mp3")]
+# Only the first match is needed, so stop scanning there
+test_file = None
+with os.scandir(processed_dir) as entries:
+    for entry in entries:
+        if entry.name.endswith((".wav", ".mp3")) and entry.is_file():
+            test_file = entry.path
+            break
 
-if not mp3_files:
-    print("No MP3 files found in processed/")
+if not test_file:
+    print("No WAV/MP3 files found in processed/")
     exit(1)
 
-test_file = os.path.join(processed_dir, mp3_files[0])
 print(f"Testing transcription on: {test_file}")
 
 try:
@@ -1,19 +1,46 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import yt_dlp
+import asyncio
 import tempfile
+import json
 import os
 import shutil
+import sys
 
 app = FastAPI(title="YT-DLP Microservice")
 
-@app.get("/download")
-def download_youtube(url: str):
-    if not url:
-        raise HTTPException(status_code=400, detail="URL required")
+CHUNK_SIZE = 1024 * 1024  # 1MB
 
-    tmp_dir = tempfile.mkdtemp()
-    
+
+def _media_type(filename: str) -> str:
+    # Determine media type based on extension
+    if filename.endswith(".webm"):
+        return "video/webm"
+    if filename.endswith(".mkv"):
+        return "video/x-matroska"
+    return "video/mp4"
+
+
+def _stderr_tail(tmp_dir: str) -> str:
+    # yt-dlp's ERROR output from the piped run's stderr (or its last line), for error messages
+    try:
+        with open(os.path.join(tmp_dir, "stderr.log"), encoding="utf-8", errors="replace") as f:
+            lines = f.read().strip().splitlines()
+    except OSError:
+        return ""
+    # An ERROR message can continue on the following lines
+    starts = [i for i, line in enumerate(lines) if line.startswith("ERROR:")]
+    return " ".join(line.strip() for line in lines[starts[0] if starts else -1:])
+
+
+def _resolve(url: str, tmp_dir: str) -> tuple:
+    """
+    Blocking yt-dlp part, run in a worker thread.
+    Returns (file_path, info_path, format_id): info_path is the info JSON for piping a
+    single-file format, or None if the file had to be downloaded and merged into file_path.
+    """
     # Clean up title to be safe for filenames
     outtmpl = os.path.join(tmp_dir, "%(title)s.%(ext)s")
 
@@ -27,37 +54,83 @@ def download_youtube(url: str):
         "socket_timeout": 30,
     }
 
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        file_path = ydl.prepare_filename(info)
+
+        # Separate video+audio formats have to be merged by FFmpeg on disk first
+        if info.get("requested_formats"):
+            ydl.process_info(info)
+            return file_path, None, None
+
+        info_path = os.path.join(tmp_dir, "info.json")
+        with open(info_path, "w", encoding="utf-8") as f:
+            json.dump(ydl.sanitize_info(info), f)
+        return file_path, info_path, info["format_id"]
+
+
+@app.get("/download")
+async def download_youtube(url: str):
+    if not url:
+        raise HTTPException(status_code=400, detail="URL required")
+
+    tmp_dir = tempfile.mkdtemp()
+
     try:
-        # Download
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            file_path = ydl.prepare_filename(info)
+        # yt-dlp is blocking; keep the event loop free for other requests meanwhile
+        file_path, info_path, format_id = await asyncio.to_thread(_resolve, url, tmp_dir)
+        if info_path is None:
+            return _file_response(file_path, tmp_dir)
+
+        # Single-file format: pipe yt-dlp's stdout straight into the response, so the
+        # client gets bytes as they arrive and nothing is written to disk.
+        # --load-info-json reuses the extraction above instead of resolving the URL again.
+        # stderr goes to a file: nothing drains a pipe for it while stdout is streamed.
+        with open(os.path.join(tmp_dir, "stderr.log"), "wb") as stderr_file:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "yt_dlp",
+                "--load-info-json", info_path,
+                "-f", format_id,
+                "-o", "-",
+                "--quiet", "--no-playlist",
+                "--force-ipv4", "--socket-timeout", "30",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr_file
+            )
+
+        # Wait for the first chunk before committing to a 200, so a download that fails
+        # up front (403, removed format, ...) is reported as an error instead of an empty body
+        try:
+            first_chunk = await process.stdout.read(CHUNK_SIZE)
+            if not first_chunk:
+                await process.wait()
+                raise RuntimeError(f"yt-dlp produced no data: {_stderr_tail(tmp_dir)}")
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
 
-        # Generator to stream file and delete temp dir afterwards
-        def iterfile():
+        async def iterpipe():
             try:
-                with open(file_path, "rb") as f:
-                    while chunk := f.read(1024 * 1024): # 1MB chunks
-                        yield chunk
+                yield first_chunk
+                while chunk := await process.stdout.read(CHUNK_SIZE):
+                    yield chunk
+                # Fail the response rather than end it cleanly, so the client sees a
+                # truncated transfer instead of a short file that looks complete
+                if await process.wait() != 0:
+                    raise RuntimeError(f"yt-dlp exited with {process.returncode}: {_stderr_tail(tmp_dir)}")
             finally:
-                # Cleanup after streaming is done
-                try:
-                    shutil.rmtree(tmp_dir)
-                except Exception as e:
-                    print(f"Error cleaning up {tmp_dir}: {e}")
+                # Client went away early: stop the download
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+                shutil.rmtree(tmp_dir, ignore_errors=True)
 
         filename = os.path.basename(file_path)
-        
-        # Determine media type based on extension
-        media_type = "video/mp4"
-        if filename.endswith(".webm"):
-            media_type = "video/webm"
-        elif filename.endswith(".mkv"):
-            media_type = "video/x-matroska"
-
         return StreamingResponse(
-            iterfile(),
-            media_type=media_type,
+            iterpipe(),
+            media_type=_media_type(filename),
             headers={
                 "Content-Disposition": f'attachment; filename="{filename}"'
             },
@@ -69,6 +142,18 @@ def download_youtube(url: str):
             shutil.rmtree(tmp_dir)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _file_response(file_path: str, tmp_dir: str) -> FileResponse:
+    # Starlette serves the file itself (sendfile where the server supports it) and sets
+    # Content-Length; the temp dir is removed once the response has been sent.
+    filename = os.path.basename(file_path)
+    return FileResponse(
+        file_path,
+        media_type=_media_type(filename),
+        filename=filename,
+        background=BackgroundTask(shutil.rmtree, tmp_dir, ignore_errors=True)
+    )
+
 @app.get("/")
 def read_root():
     return {"status": "downloader-service-running"}